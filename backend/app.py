@@ -1,3 +1,4 @@
+import threading
 from flask import Flask
 from flask_cors import CORS
 from backend.config.env_config import Config
@@ -8,6 +9,9 @@ from backend.routes.user_routes import user_bp
 from backend.routes.summary_routes import summary_bp
 from backend.routes.chat_routes import chat_bp
 from backend.routes.study_routes import study_bp
+from backend.routes.metrics_routes import metrics_bp
+from backend.services.semantic_memory import warm_up
+from backend.models.schema import migrate
 
 app = Flask(__name__)
 CORS(app)
@@ -23,6 +27,18 @@ app.register_blueprint(user_bp, url_prefix="/api/users")
 app.register_blueprint(summary_bp, url_prefix="/api/summary")
 app.register_blueprint(chat_bp, url_prefix="/api/chat")
 app.register_blueprint(study_bp, url_prefix="/api/study")
+app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
+
+# Schema changes run once per start, before any request can touch the new tables
+if Config.AUTO_MIGRATE:
+    try:
+        migrate()
+    except Exception as e:
+        print(f"⚠️ Schema migration failed: {e}")
+
+# Warm up the embedding model in the background so the first chat request after a deploy is fast
+if Config.PRELOAD_MODELS:
+    threading.Thread(target=warm_up, name="model-warmup", daemon=True).start()
 
 @app.route("/")
 def home():
@@ -1,10 +1,142 @@
+import time
+import threading
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+from backend.config.env_config import Config
+
+_pool = None
+_pool_lock = threading.Lock()
+# Signalled whenever a connection goes back to the pool, so waiters block instead of polling
+_returned = threading.Condition()
+_in_use = 0
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "waits": 0,
+    "wait_seconds": 0.0,
+    "timeouts": 0,
+}
+
+
+def _connect_args() -> dict:
+    return {
+        "host": Config.DB_HOST,
+        "user": Config.DB_USER,
+        "password": Config.DB_PASSWORD,
+        "database": Config.DB_NAME,
+    }
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="study_buddy",
+                    pool_size=min(Config.DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE),
+                    pool_reset_session=True,
+                    **_connect_args(),
+                )
+    return _pool
+
+
+def _bump(key: str, amount=1) -> None:
+    with _stats_lock:
+        _stats[key] += amount
+
 
 def get_db_connection():
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="root",          
-        password="12345678",  
-        database="study_buddy"
-    )
+    """Check a connection out of the pool; return it with release_db_connection().
+
+    Blocks up to DB_POOL_TIMEOUT seconds when every pooled connection is in use.
+    """
+    global _in_use
+    if Config.DB_POOL_SIZE <= 0:
+        _bump("checkouts")
+        return mysql.connector.connect(**_connect_args())
+
+    pool = _get_pool()
+    started = time.monotonic()
+    waited = False
+    with _returned:
+        while True:
+            try:
+                # The connector pings the connection and reconnects it if the server dropped it
+                connection = pool.get_connection()
+                _in_use += 1
+                break
+            except PoolError:
+                remaining = Config.DB_POOL_TIMEOUT - (time.monotonic() - started)
+                if remaining <= 0:
+                    _bump("timeouts")
+                    raise
+                waited = True
+                _returned.wait(remaining)
+    if waited:
+        _bump("waits")
+        _bump("wait_seconds", time.monotonic() - started)
+    _bump("checkouts")
     return connection
+
+
+def release_db_connection(connection) -> None:
+    """Return a connection from get_db_connection() and wake one waiting caller."""
+    global _in_use
+    if Config.DB_POOL_SIZE <= 0:
+        connection.close()
+        return
+    with _returned:
+        connection.close()
+        _in_use -= 1
+        _returned.notify()
+
+
+@contextmanager
+def db_connection():
+    """Context manager yielding a pooled connection and returning it on exit."""
+    connection = get_db_connection()
+    try:
+        yield connection
+    finally:
+        release_db_connection(connection)
+
+
+@contextmanager
+def db_cursor(dictionary: bool = False, commit: bool = False):
+    """Context manager yielding a cursor on a pooled connection.
+
+    With commit=True the transaction is committed when the block exits normally.
+    Any exception rolls the transaction back before the connection goes back to the pool.
+    """
+    with db_connection() as connection:
+        cursor = connection.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+            if commit:
+                connection.commit()
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            cursor.close()
+
+
+def get_pool_stats() -> dict:
+    """Pool size, current usage and checkout counters."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["wait_seconds"] = round(stats["wait_seconds"], 4)
+    stats["pool_size"] = max(0, min(Config.DB_POOL_SIZE, pooling.CNX_POOL_MAXSIZE))
+    # Counted here rather than read from the connector's private queue
+    with _returned:
+        stats["in_use"] = _in_use
+    stats["idle"] = max(0, stats["pool_size"] - stats["in_use"])
+    return stats
@@ -1,19 +1,30 @@
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
+
 
 def save_chat_message(user_id, message, response):
-    connection = get_db_connection()
-    cursor = connection.cursor()
     query = "INSERT INTO chat_history (user_id, message, response) VALUES (%s, %s, %s)"
-    cursor.execute(query, (user_id, message, response))
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (user_id, message, response))
+
+def save_chat_messages(rows):
+    """Insert many (user_id, message, response, timestamp) rows in one batched statement."""
+    if not rows:
+        return
+    query = "INSERT INTO chat_history (user_id, message, response, timestamp) VALUES (%s, %s, %s, %s)"
+    with db_cursor(commit=True) as cursor:
+        cursor.executemany(query, rows)
 
-def get_chat_history(user_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM chat_history WHERE user_id = %s ORDER BY timestamp DESC", (user_id,))
-    chats = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return chats
+def get_chat_history_page(user_id, limit, before_id=None):
+    """Up to limit turns, newest first. before_id: id of the last row of the previous page.
+    Paging on id alone keeps rows with a NULL timestamp in the history.
+    """
+    query = "SELECT id, message, response, timestamp FROM chat_history WHERE user_id = %s"
+    params = [user_id]
+    if before_id is not None:
+        query += " AND id < %s"
+        params.append(before_id)
+    query += " ORDER BY id DESC LIMIT %s"
+    params.append(limit)
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(query, tuple(params))
+        return cursor.fetchall()
@@ -1,37 +1,39 @@
 import os
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
+from backend.utils.digest import text_digest
 
-# 🧠 Save document with extracted content
-def save_document(user_id, filename, file_path, content):
-    connection = get_db_connection()
-    cursor = connection.cursor()
 
-    # Insert with uploaded_at + content
-    query = """
-        INSERT INTO documents (user_id, title, file_path, content, uploaded_at)
-        VALUES (%s, %s, %s, %s, NOW())
-    """
-    cursor.execute(query, (user_id, filename, file_path, content))
-    connection.commit()
-    cursor.close()
-    connection.close()
+# 🧠 Save document with extracted content
+def save_document(user_id, filename, file_path, content, content_hash=None):
+    content_hash = content_hash or text_digest(content)
+    with db_cursor(commit=True) as cursor:
+        # Only ship the text to MySQL if this content has never been stored
+        cursor.execute("SELECT 1 FROM document_contents WHERE content_hash = %s", (content_hash,))
+        if not cursor.fetchone():
+            cursor.execute(
+                "INSERT IGNORE INTO document_contents (content_hash, content) VALUES (%s, %s)",
+                (content_hash, content),
+            )
+        # Insert with uploaded_at; the text itself is linked by content_hash
+        query = """
+            INSERT INTO documents (user_id, title, file_path, content, content_hash, uploaded_at)
+            VALUES (%s, %s, %s, NULL, %s, NOW())
+        """
+        cursor.execute(query, (user_id, filename, file_path, content_hash))
+        return cursor.lastrowid
 
 
 # 📄 Get all documents for user
 def get_user_documents(user_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-
     query = """
         SELECT id, title AS filename, file_path, uploaded_at AS upload_date
         FROM documents
         WHERE user_id = %s
         ORDER BY uploaded_at DESC
     """
-    cursor.execute(query, (user_id,))
-    docs = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(query, (user_id,))
+        docs = cursor.fetchall()
 
     for doc in docs:
         doc["file_size"] = None  # optional placeholder
@@ -40,16 +42,13 @@ def get_user_documents(user_id):
 
 # 🧾 Get single document including text
 def get_document_by_id(document_id, user_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-
     query = """
-        SELECT id, title AS filename, file_path, content, uploaded_at AS upload_date
-        FROM documents
-        WHERE id = %s AND user_id = %s
+        SELECT d.id, d.title AS filename, d.file_path, d.content_hash,
+               COALESCE(d.content, c.content) AS content, d.uploaded_at AS upload_date
+        FROM documents d
+        LEFT JOIN document_contents c ON c.content_hash = d.content_hash
+        WHERE d.id = %s AND d.user_id = %s
     """
-    cursor.execute(query, (document_id, user_id))
-    doc = cursor.fetchone()
-    cursor.close()
-    connection.close()
-    return doc
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(query, (document_id, user_id))
+        return cursor.fetchone()
@@ -1,22 +1,28 @@
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
+
+_INSERT_QUESTION = """
+    INSERT INTO questions (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
 
 def add_question(quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    query = """
-        INSERT INTO questions (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(_INSERT_QUESTION, (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer))
+
+def add_questions(quiz_id, rows, cursor=None):
+    """Insert many (question_text, option_a, option_b, option_c, option_d, correct_answer) rows in one batch.
+    Pass cursor to take part in the caller's transaction.
     """
-    cursor.execute(query, (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer))
-    connection.commit()
-    cursor.close()
-    connection.close()
+    params = [(quiz_id,) + tuple(row) for row in rows]
+    if not params:
+        return
+    if cursor is not None:
+        cursor.executemany(_INSERT_QUESTION, params)
+        return
+    with db_cursor(commit=True) as cursor:
+        cursor.executemany(_INSERT_QUESTION, params)
 
 def get_questions_by_quiz(quiz_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-    questions = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return questions
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM questions WHERE quiz_id = %s ORDER BY id", (quiz_id,))
+        return cursor.fetchall()
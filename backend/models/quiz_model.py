@@ -1,21 +1,42 @@
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
+from backend.models.question_model import add_questions
+
 
 def create_quiz(document_id, title):
-    connection = get_db_connection()
-    cursor = connection.cursor()
     query = "INSERT INTO quizzes (document_id, title) VALUES (%s, %s)"
-    cursor.execute(query, (document_id, title))
-    connection.commit()
-    quiz_id = cursor.lastrowid
-    cursor.close()
-    connection.close()
-    return quiz_id
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (document_id, title))
+        return cursor.lastrowid
+
+def save_generated_quiz(document_id, title, content_hash, num_questions, provider, question_rows):
+    """Insert a quiz and all of its questions in a single transaction. Returns the quiz id."""
+    query = """
+        INSERT INTO quizzes (document_id, title, content_hash, num_questions, provider)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (document_id, title, content_hash, num_questions, provider))
+        quiz_id = cursor.lastrowid
+        add_questions(quiz_id, question_rows, cursor=cursor)
+        return quiz_id
+
+def find_generated_quiz(content_hash, num_questions, provider, document_id=None):
+    """Stored quiz for this content and settings with its questions, or None.
+    A quiz of document_id is preferred over one generated for another document.
+    """
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("""
+            SELECT id, document_id FROM quizzes
+            WHERE content_hash = %s AND num_questions = %s AND provider = %s
+            ORDER BY (document_id = %s) DESC, id DESC LIMIT 1
+        """, (content_hash, num_questions, provider, document_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute("SELECT * FROM questions WHERE quiz_id = %s ORDER BY id", (row["id"],))
+        return {"quiz_id": row["id"], "document_id": row["document_id"], "questions": cursor.fetchall()}
 
 def get_quizzes_by_document(document_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM quizzes WHERE document_id = %s", (document_id,))
-    quizzes = cursor.fetchall()
-    cursor.close()
-    connection.close()
-    return quizzes
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM quizzes WHERE document_id = %s", (document_id,))
+        return cursor.fetchall()
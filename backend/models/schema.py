@@ -0,0 +1,179 @@
+from backend.config.db_config import db_connection
+
+# Schema changes made on top of the original tables, applied once at startup (see app.py)
+# or by hand with `python -m backend.models.schema` for a user that has DDL privileges.
+# Every step checks what is already there, so running them again is a no-op.
+# A MySQL named lock serializes processes that start at the same time.
+_LOCK_NAME = "study_buddy_schema"
+_LOCK_TIMEOUT_SECONDS = 60
+
+
+def _column_exists(cur, table, column):
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return bool(cur.fetchone()[0])
+
+
+def _index_exists(cur, table, index):
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, index))
+    return bool(cur.fetchone()[0])
+
+
+# One-off data changes are recorded here in the same transaction as the data they write;
+# DDL commits on its own in MySQL, so a table's existence cannot mark them as done
+def _schema_migrations(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _applied(cur, name):
+    cur.execute("SELECT 1 FROM schema_migrations WHERE name = %s", (name,))
+    return cur.fetchone() is not None
+
+
+def _mark_applied(cur, name):
+    cur.execute("INSERT IGNORE INTO schema_migrations (name) VALUES (%s)", (name,))
+
+
+# 🗄️ Extracted text is stored once per distinct content in document_contents;
+# documents rows link to it through content_hash (legacy rows keep their inline content)
+def _document_contents(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS document_contents (
+            content_hash CHAR(64) NOT NULL PRIMARY KEY,
+            content LONGTEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    if not _column_exists(cur, "documents", "content_hash"):
+        cur.execute("ALTER TABLE documents ADD COLUMN content_hash CHAR(64) NULL, ADD INDEX idx_documents_content_hash (content_hash)")
+
+
+# Summaries keyed by the digest of the summarized text
+def _summary_cache(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS summary_cache (
+            text_hash CHAR(64) NOT NULL,
+            length VARCHAR(16) NOT NULL,
+            model VARCHAR(191) NOT NULL,
+            mode VARCHAR(16) NOT NULL,
+            summary_text LONGTEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (text_hash, length, model, mode)
+        )
+    """)
+
+
+# Generated quizzes are looked up by (content_hash, num_questions, provider)
+def _quiz_generation(cur):
+    if not _column_exists(cur, "quizzes", "content_hash"):
+        cur.execute("""
+            ALTER TABLE quizzes
+                ADD COLUMN content_hash CHAR(64) NULL,
+                ADD COLUMN num_questions INT NULL,
+                ADD COLUMN provider VARCHAR(32) NULL,
+                ADD INDEX idx_quizzes_generation (content_hash, num_questions, provider)
+        """)
+
+
+# History pages are read newest first per user, keyed on id; this index serves them without a sort
+def _chat_history_index(cur):
+    if not _index_exists(cur, "chat_history", "idx_chat_history_user_id"):
+        cur.execute("ALTER TABLE chat_history ADD INDEX idx_chat_history_user_id (user_id, id)")
+
+
+# Rollups kept next to study_sessions: seconds per user per day, and per user overall.
+# Seconds are attributed to the day of the heartbeat that counted them.
+def _study_rollups(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS study_daily (
+            user_id INT NOT NULL,
+            day DATE NOT NULL,
+            seconds INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS study_totals (
+            user_id INT NOT NULL PRIMARY KEY,
+            total_seconds BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    if _applied(cur, "study_rollups_backfill"):
+        return
+    # Databases set up before the marker existed already hold backfilled totals
+    cur.execute("SELECT COUNT(*) FROM study_totals")
+    if not cur.fetchone()[0]:
+        # Backfill from existing sessions, each counted on the day it was last seen
+        cur.execute("""
+            INSERT INTO study_daily (user_id, day, seconds)
+            SELECT user_id, DATE(last_seen), SUM(total_seconds)
+            FROM study_sessions
+            GROUP BY user_id, DATE(last_seen)
+            ON DUPLICATE KEY UPDATE seconds = VALUES(seconds)
+        """)
+        cur.execute("""
+            INSERT INTO study_totals (user_id, total_seconds)
+            SELECT user_id, SUM(total_seconds) FROM study_sessions GROUP BY user_id
+            ON DUPLICATE KEY UPDATE total_seconds = VALUES(total_seconds)
+        """)
+    # Committed with the backfill rows, so an interrupted backfill is simply run again
+    _mark_applied(cur, "study_rollups_backfill")
+
+
+# Revoked tokens shared by every worker process until they expire
+def _revoked_tokens(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            token_digest CHAR(64) NOT NULL PRIMARY KEY,
+            expires_at BIGINT NOT NULL,
+            INDEX idx_revoked_tokens_expires_at (expires_at)
+        )
+    """)
+
+
+_STEPS = [
+    _schema_migrations,
+    _document_contents,
+    _summary_cache,
+    _quiz_generation,
+    _chat_history_index,
+    _study_rollups,
+    _revoked_tokens,
+]
+
+
+def migrate():
+    """Apply every pending schema change. Safe to run from several processes at once."""
+    with db_connection() as connection:
+        cur = connection.cursor()
+        try:
+            cur.execute("SELECT GET_LOCK(%s, %s)", (_LOCK_NAME, _LOCK_TIMEOUT_SECONDS))
+            if cur.fetchone()[0] != 1:
+                raise RuntimeError("Timed out waiting for another process to finish migrating")
+            try:
+                for step in _STEPS:
+                    step(cur)
+                    connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+                cur.fetchone()
+        finally:
+            cur.close()
+
+
+if __name__ == "__main__":
+    migrate()
+    print("✅ Schema is up to date")
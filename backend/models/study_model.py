@@ -1,5 +1,6 @@
-from datetime import datetime, timedelta
-from backend.config.db_config import get_db_connection
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from backend.config.db_config import db_cursor
 
 # Cap any single heartbeat gap to 180 seconds to avoid huge jumps when tab sleeps
 MAX_GAP_SECONDS = 180
@@ -9,139 +10,139 @@ def _now() -> datetime:
     return datetime.utcnow()
 
 
-def upsert_active_session(user_id: int, now: datetime | None = None) -> None:
-    now = now or _now()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # If there is an active session, do nothing
+def _add_rollups(cur, deltas) -> None:
+    """Fold (user_id, when, seconds) deltas into study_daily and study_totals."""
+    daily = defaultdict(int)
+    totals = defaultdict(int)
+    for user_id, when, seconds in deltas:
+        if seconds:
+            daily[(user_id, when.date())] += seconds
+            totals[user_id] += seconds
+    if not daily:
+        return
+    cur.executemany(
+        """
+        INSERT INTO study_daily (user_id, day, seconds) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE seconds = seconds + VALUES(seconds)
+        """,
+        [(user_id, day, seconds) for (user_id, day), seconds in daily.items()],
+    )
+    cur.executemany(
+        """
+        INSERT INTO study_totals (user_id, total_seconds) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE total_seconds = total_seconds + VALUES(total_seconds)
+        """,
+        list(totals.items()),
+    )
+
+
+def get_active_session(user_id: int):
+    """(id, last_seen) of the user's active session, or None."""
+    with db_cursor() as cur:
         cur.execute(
-            "SELECT id FROM study_sessions WHERE user_id = %s AND active = 1 LIMIT 1",
+            "SELECT id, last_seen FROM study_sessions WHERE user_id = %s AND active = 1 ORDER BY id DESC LIMIT 1",
             (user_id,),
         )
         row = cur.fetchone()
-        if row:
-            return
-        # Otherwise create a new active session
-        cur.execute(
-            """
-            INSERT INTO study_sessions (user_id, start_time, last_seen, total_seconds, active)
-            VALUES (%s, %s, %s, %s, 1)
-            """,
-            (user_id, now, now, 0),
-        )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+        return (row[0], row[1]) if row else None
 
 
-def touch_heartbeat(user_id: int, now: datetime | None = None) -> None:
-    now = now or _now()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Ensure active session exists
+def _credit(seconds: int, last_seen: datetime, stored_last_seen) -> int:
+    # Never credit more than the wall time since the session was last written: a delta
+    # replayed, or counted by a second process for the same stretch, adds nothing twice
+    if stored_last_seen is None:
+        return seconds
+    return max(0, min(seconds, int((last_seen - stored_last_seen).total_seconds())))
+
+
+def ensure_session(user_id: int, start_time: datetime, last_seen: datetime, seconds: int):
+    """Credit seconds to the user's active session, creating it if there is none.
+    Returns (session_id, seconds credited).
+    """
+    with db_cursor(commit=True) as cur:
         cur.execute(
-            "SELECT id, last_seen FROM study_sessions WHERE user_id = %s AND active = 1 ORDER BY id DESC LIMIT 1",
+            "SELECT id, last_seen FROM study_sessions WHERE user_id = %s AND active = 1 ORDER BY id DESC LIMIT 1 FOR UPDATE",
             (user_id,),
         )
         row = cur.fetchone()
-        if not row:
-            # Start a new session
+        if row:
+            session_id, credited = row[0], _credit(seconds, last_seen, row[1])
+            cur.execute(
+                "UPDATE study_sessions SET last_seen = GREATEST(last_seen, %s), total_seconds = total_seconds + %s WHERE id = %s",
+                (last_seen, credited, session_id),
+            )
+        else:
+            credited = seconds
             cur.execute(
                 "INSERT INTO study_sessions (user_id, start_time, last_seen, total_seconds, active) VALUES (%s, %s, %s, %s, 1)",
-                (user_id, now, now, 0),
+                (user_id, start_time, last_seen, credited),
             )
-            conn.commit()
-            return
+            session_id = cur.lastrowid
+        _add_rollups(cur, [(user_id, last_seen, credited)])
+        return session_id, credited
 
-        session_id, last_seen = row
-        if hasattr(last_seen, 'timestamp'):
-            # last_seen is datetime; compute delta
-            delta = int((now - last_seen).total_seconds())
-        else:
-            delta = 0
-        if delta < 0:
-            delta = 0
-        if delta > MAX_GAP_SECONDS:
-            delta = MAX_GAP_SECONDS
 
+def add_session_seconds(rows) -> dict:
+    """Apply many (user_id, last_seen, seconds, session_id) heartbeat deltas and their rollups in one transaction.
+
+    Idempotent per session: each delta is credited only up to the time elapsed since the
+    session's stored last_seen. Returns {session_id: seconds credited}.
+    """
+    if not rows:
+        return {}
+    with db_cursor(commit=True) as cur:
+        ids = [session_id for _, _, _, session_id in rows]
         cur.execute(
+            "SELECT id, last_seen FROM study_sessions WHERE id IN (%s) FOR UPDATE" % ", ".join(["%s"] * len(ids)),
+            tuple(ids),
+        )
+        stored = dict(cur.fetchall())
+        credited = {session_id: _credit(seconds, last_seen, stored.get(session_id))
+                    for _, last_seen, seconds, session_id in rows if session_id in stored}
+        cur.executemany(
             """
             UPDATE study_sessions
-            SET last_seen = %s,
+            SET last_seen = GREATEST(last_seen, %s),
                 total_seconds = total_seconds + %s
             WHERE id = %s
             """,
-            (now, delta, session_id),
+            [(last_seen, credited[session_id], session_id) for _, last_seen, _, session_id in rows if session_id in credited],
         )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+        _add_rollups(cur, [(user_id, last_seen, credited[session_id])
+                           for user_id, last_seen, _, session_id in rows if session_id in credited])
+        return credited
 
 
-def get_stats(user_id: int, now: datetime | None = None) -> dict:
+def get_totals(user_id: int, now: datetime | None = None) -> dict:
+    """Stored totals only, without the in-flight delta of the active session."""
     now = now or _now()
-    start_of_day = datetime(now.year, now.month, now.day)
+    start_of_day = now.date()
     start_of_week = start_of_day - timedelta(days=start_of_day.weekday())
-
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Sum totals; include active session delta from last_seen to now in the SELECT for better accuracy
-        # Today
+    with db_cursor() as cur:
+        # At most seven daily rows for today and this week; the lifetime total is kept precomputed
         cur.execute(
             """
-            SELECT COALESCE(SUM(total_seconds), 0)
-            FROM study_sessions
-            WHERE user_id = %s AND last_seen >= %s
+            SELECT COALESCE(SUM(CASE WHEN day = %s THEN seconds END), 0),
+                   COALESCE(SUM(seconds), 0),
+                   (SELECT total_seconds FROM study_totals WHERE user_id = %s)
+            FROM study_daily
+            WHERE user_id = %s AND day >= %s
             """,
-            (user_id, start_of_day),
+            (start_of_day, user_id, user_id, start_of_week),
         )
-        today = cur.fetchone()[0] or 0
+        today, week, all_time = cur.fetchone()
+    return {
+        "today_seconds": int(today or 0),
+        "week_seconds": int(week or 0),
+        "all_time_seconds": int(all_time or 0),
+    }
 
-        # This week
-        cur.execute(
-            """
-            SELECT COALESCE(SUM(total_seconds), 0)
-            FROM study_sessions
-            WHERE user_id = %s AND last_seen >= %s
-            """,
-            (user_id, start_of_week),
-        )
-        week = cur.fetchone()[0] or 0
 
-        # All time
+def get_daily_seconds(user_id: int, since: date) -> dict:
+    """{day: seconds} from the daily rollup for days on or after since."""
+    with db_cursor() as cur:
         cur.execute(
-            "SELECT COALESCE(SUM(total_seconds), 0) FROM study_sessions WHERE user_id = %s",
-            (user_id,),
+            "SELECT day, seconds FROM study_daily WHERE user_id = %s AND day >= %s",
+            (user_id, since),
         )
-        all_time = cur.fetchone()[0] or 0
-
-        # Add current active delta (if any) to all three
-        cur.execute(
-            "SELECT last_seen FROM study_sessions WHERE user_id = %s AND active = 1 ORDER BY id DESC LIMIT 1",
-            (user_id,),
-        )
-        row = cur.fetchone()
-        if row:
-            last_seen = row[0]
-            extra = int((now - last_seen).total_seconds())
-            if extra < 0:
-                extra = 0
-            if extra > MAX_GAP_SECONDS:
-                extra = MAX_GAP_SECONDS
-            today += extra
-            week += extra
-            all_time += extra
-
-        return {
-            "today_seconds": int(today),
-            "week_seconds": int(week),
-            "all_time_seconds": int(all_time),
-        }
-    finally:
-        cur.close()
-        conn.close()
+        return {day: int(seconds) for day, seconds in cur.fetchall()}
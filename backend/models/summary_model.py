@@ -1,22 +1,39 @@
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
+
 
 def save_summary(document_id, summary_text):
-    connection = get_db_connection()
-    cursor = connection.cursor()
     query = """
         INSERT INTO summaries (document_id, summary_text)
         VALUES (%s, %s)
     """
-    cursor.execute(query, (document_id, summary_text))
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (document_id, summary_text))
 
 def get_summary_by_document(document_id):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM summaries WHERE document_id = %s", (document_id,))
-    summary = cursor.fetchone()
-    cursor.close()
-    connection.close()
-    return summary
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM summaries WHERE document_id = %s", (document_id,))
+        return cursor.fetchone()
+
+def get_cached_summary(text_hash, length, model, mode):
+    query = """
+        SELECT summary_text FROM summary_cache
+        WHERE text_hash = %s AND length = %s AND model = %s AND mode = %s
+    """
+    with db_cursor() as cursor:
+        cursor.execute(query, (text_hash, length, model, mode))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def save_cached_summary(text_hash, length, model, mode, summary_text):
+    query = """
+        INSERT INTO summary_cache (text_hash, length, model, mode, summary_text)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE summary_text = VALUES(summary_text), created_at = CURRENT_TIMESTAMP
+    """
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (text_hash, length, model, mode, summary_text))
+
+def delete_cached_summaries(text_hash):
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM summary_cache WHERE text_hash = %s", (text_hash,))
+        return cursor.rowcount
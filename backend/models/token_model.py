@@ -0,0 +1,25 @@
+from backend.config.db_config import db_cursor
+
+
+def add_revoked_token(token_digest, expires_at):
+    """Record a revoked token (sha256 hex digest) until its exp, in unix seconds."""
+    query = """
+        INSERT INTO revoked_tokens (token_digest, expires_at)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)
+    """
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (token_digest, int(expires_at)))
+
+def get_active_revocations():
+    """{token_digest: expires_at} for revoked tokens that have not expired yet."""
+    with db_cursor() as cursor:
+        cursor.execute(
+            "SELECT token_digest, expires_at FROM revoked_tokens WHERE expires_at > UNIX_TIMESTAMP()"
+        )
+        return {digest: float(exp) for digest, exp in cursor.fetchall()}
+
+def delete_expired_revocations():
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= UNIX_TIMESTAMP()")
+        return cursor.rowcount
@@ -1,19 +1,15 @@
-from backend.config.db_config import get_db_connection
+from backend.config.db_config import db_cursor
 
 def create_user(name, email, password_hash):
-    connection = get_db_connection()
-    cursor = connection.cursor()
     query = "INSERT INTO users (name, email, password_hash) VALUES (%s, %s, %s)"
-    cursor.execute(query, (name, email, password_hash))
-    connection.commit()
-    cursor.close()
-    connection.close()
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(query, (name, email, password_hash))
 
 def get_user_by_email(email):
-    connection = get_db_connection()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-    cursor.close()
-    connection.close()
-    return user
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        return cursor.fetchone()
+
+def update_password_hash(user_id, password_hash):
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (password_hash, user_id))
@@ -1,10 +1,23 @@
+import jwt
 from flask import Blueprint, request, jsonify
-import bcrypt
-from backend.models.user_model import get_user_by_email
-from backend.utils.jwt_utils import verify_token, generate_access_token, generate_refresh_token, refresh_access_token
+from backend.models.user_model import get_user_by_email, update_password_hash
+from backend.utils.passwords import check_password, needs_rehash, hash_password_async, PasswordHasherBusy
+from backend.utils.jwt_utils import verify_token, generate_access_token, generate_refresh_token, refresh_access_token, revoke_token
 
 auth_bp = Blueprint("auth_bp", __name__)
 
+def _rehash_in_background(user_id, password):
+    def _store(future):
+        try:
+            update_password_hash(user_id, future.result())
+        except Exception as e:
+            print("⚠️ Password rehash failed:", e)
+    try:
+        hash_password_async(password).add_done_callback(_store)
+    except PasswordHasherBusy:
+        # Try again on a later login
+        pass
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     """User login endpoint - generates JWT tokens"""
@@ -22,13 +35,19 @@ def login():
     if not user:
         return jsonify({"error": "Invalid email or password"}), 401
 
-    # Verify password using bcrypt
+    # Verify password using bcrypt (on the dedicated hashing pool)
     try:
-        if not bcrypt.checkpw(password.encode('utf-8'), user["password_hash"].encode('utf-8')):
+        if not check_password(password, user["password_hash"]):
             return jsonify({"error": "Invalid email or password"}), 401
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server busy, please retry"}), 503
     except Exception as e:
         return jsonify({"error": "Authentication failed"}), 401
 
+    # Upgrade hashes made with an older BCRYPT_ROUNDS, without delaying this login
+    if needs_rehash(user["password_hash"]):
+        _rehash_in_background(user["id"], password)
+
     try:
         # Generate JWT tokens
         access_token = generate_access_token(user["id"])
@@ -74,5 +93,16 @@ def refresh():
 @auth_bp.route("/logout", methods=["POST"])
 @verify_token()
 def logout():
-    """User logout endpoint - client should discard tokens"""
+    """User logout endpoint - revokes the access token and, if sent, the refresh token"""
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    try:
+        revoke_token(request.token)
+        if refresh_token:
+            try:
+                revoke_token(refresh_token)
+            except jwt.InvalidTokenError:
+                # An invalid or expired refresh token cannot be used anyway
+                pass
+    except Exception as e:
+        return jsonify({"error": f"Logout failed: {str(e)}"}), 500
     return jsonify({"message": "Logout successful"}), 200
@@ -1,41 +1,59 @@
 from flask import Blueprint, request, jsonify
 from backend.utils.jwt_utils import verify_token
-from backend.models.document_model import get_document_by_id
-from backend.services.file_reader import read_text_from_file
-from backend.services.langchain_ai import chat_with_context, get_chat_provider
+from backend.utils.sse import sse_event, sse_response
+from backend.services.document_text import get_document_entry
+from backend.services.bm25_index import get_sentence_index
+from backend.services.langchain_ai import chat_with_context, stream_chat_with_context, get_chat_provider
 from backend.services.semantic_memory import retrieve_context
+from backend.services.chat_history import record_chat_turn, get_history_page
 
 chat_bp = Blueprint('chat_bp', __name__)
 
-@chat_bp.route('/message', methods=['POST'])
-@verify_token()
-def chat_message():
-    data = request.get_json() or {}
-    message = data.get('message', '').strip()
-    document_id = data.get('document_id')
-
-    if not message:
-        return jsonify({"error": "Message is required"}), 400
 
+def _chat_context(message, document_id, provider):
+    """(context_text, sentence_index, memory_text) for a message: the selected document plus semantic memory.
+    memory_text is the retrieved chunks alone, scored next to the sentence index by the offline answerer.
+    """
     context_text = None
+    sentence_index = None
+    memory_text = None
     if document_id:
-        # fetch only if authorized
-        doc = get_document_by_id(document_id, request.user_id)
-        if doc:
-            context_text = read_text_from_file(doc.get('file_path'))
+        # fetch only if authorized (served from the in-memory document text cache)
+        entry = get_document_entry(document_id, request.user_id)
+        if entry and entry["text"]:
+            context_text = entry["text"]
+            # The offline answerer ranks the document's sentences through its BM25 index
+            if provider == "offline":
+                sentence_index = get_sentence_index(entry["content_hash"], entry["text"])
 
     # Retrieve semantic memory context (top-k chunks) using user's index
     try:
         topk_contexts = retrieve_context(request.user_id, message, k=3)
         if topk_contexts:
-            extra = "\n\n".join(topk_contexts)
-            context_text = (context_text + "\n\n" + extra) if context_text else extra
+            memory_text = "\n\n".join(topk_contexts)
+            context_text = (context_text + "\n\n" + memory_text) if context_text else memory_text
     except Exception:
         pass
+    return context_text, sentence_index, memory_text
+
+
+@chat_bp.route('/message', methods=['POST'])
+@verify_token()
+def chat_message():
+    data = request.get_json() or {}
+    message = data.get('message', '').strip()
+    document_id = data.get('document_id')
+
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
 
-    # Generate LLM-based reply (falls back gracefully if no API key)
-    reply = chat_with_context(message, context_text)
     provider = get_chat_provider()
+    context_text, sentence_index, memory_text = _chat_context(message, document_id, provider)
+
+    # Generate LLM-based reply (falls back gracefully if no API key)
+    reply = chat_with_context(message, context_text, sentence_index, memory_text)
+    # Persisted in the background by the write-behind buffer
+    record_chat_turn(request.user_id, message, reply)
 
     return jsonify({
         "message": reply,
@@ -46,3 +64,50 @@ def chat_message():
     }), 200
 
 
+@chat_bp.route('/stream', methods=['POST'])
+@verify_token()
+def chat_stream():
+    """Server-Sent Events variant of /message: 'token' events as the reply is generated, then 'done'"""
+    data = request.get_json() or {}
+    message = data.get('message', '').strip()
+    document_id = data.get('document_id')
+
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+
+    provider = get_chat_provider()
+    # Context is gathered while the request context is still available
+    context_text, sentence_index, memory_text = _chat_context(message, document_id, provider)
+    user_id = request.user_id
+
+    def _events():
+        parts = []
+        for piece in stream_chat_with_context(message, context_text, sentence_index, memory_text):
+            parts.append(piece)
+            yield sse_event({"type": "token", "text": piece}, event="token")
+        reply = "".join(parts).strip()
+        record_chat_turn(user_id, message, reply)
+        yield sse_event({
+            "type": "done",
+            "message": reply,
+            "document_id": document_id,
+            "has_context": bool(context_text),
+            "provider": provider,
+        }, event="done")
+
+    return sse_response(_events())
+
+
+@chat_bp.route('/history', methods=['GET'])
+@verify_token()
+def chat_history():
+    """Newest-first chat turns; pass the returned next_cursor to fetch the following page"""
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        page = get_history_page(request.user_id, limit, request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    return jsonify(page), 200
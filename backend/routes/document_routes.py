@@ -1,16 +1,14 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 import os
+import uuid
 
-from backend.models.document_model import save_document, get_user_documents, get_document_by_id
-from backend.services.semantic_memory import build_or_update_user_index
+from backend.models.document_model import get_user_documents, get_document_by_id
+from backend.services.ingestion import submit_ingestion, get_job
+from backend.services.content_store import save_stream_hashed
+from backend.services.extraction import extract_text
 from backend.utils.jwt_utils import verify_token
 
-# External libraries for reading files
-from PyPDF2 import PdfReader
-import docx2txt
-import pdfplumber
-
 # Initialize Blueprint
 document_bp = Blueprint("document_bp", __name__)
 
@@ -21,28 +19,11 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # 🧩 Helper function: Extract text content from different file types
 def extract_text_from_file(file_path):
-    text = ""
     try:
-        if file_path.endswith(".pdf"):
-            # First try PyPDF2
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += (page.extract_text() or "")
-            # If PyPDF2 yields too little text, fallback to pdfplumber for better quality
-            if len((text or '').strip()) < 400:
-                try:
-                    with pdfplumber.open(file_path) as pdf:
-                        text = " ".join([p.extract_text() or "" for p in pdf.pages])
-                except Exception as _:
-                    pass
-        elif file_path.endswith(".docx"):
-            text = docx2txt.process(file_path)
-        elif file_path.endswith(".txt"):
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
+        return extract_text(file_path)
     except Exception as e:
         print(f"⚠️ Error extracting text: {e}")
-    return text.strip()
+        return ""
 
 
 # 📤 Upload file
@@ -58,24 +39,33 @@ def upload_file():
         return jsonify({"error": "No selected file"}), 400
 
     filename = secure_filename(file.filename)
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(file_path)
+    # Each upload gets its own file: a later upload with the same name must not replace
+    # the bytes this upload's job will extract and cache under file_hash
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}")
+    # Hash while streaming to disk so duplicate uploads can skip extraction and embedding
+    file_hash = save_stream_hashed(file.stream, file_path)
 
-    # ✅ Extract text content from the uploaded file
-    text_content = extract_text_from_file(file_path)
+    # ✅ Extract, store and index in the background; the client polls the job
+    job_id = submit_ingestion(request.user_id, filename, file_path, extract_text_from_file, file_hash)
 
-    # ✅ Save document in DB (linked to authenticated user)
-    save_document(request.user_id, filename, file_path, text_content)
+    return jsonify({
+        "message": "File uploaded successfully!",
+        "file": filename,
+        "job_id": job_id,
+        "status": "queued",
+    }), 202
 
-    # 🔎 Update semantic index for this user (best-effort)
-    try:
-        def _fetch(doc_id, user_id):
-            return get_document_by_id(doc_id, user_id)
-        build_or_update_user_index(request.user_id, _fetch)
-    except Exception as _:
-        pass
 
-    return jsonify({"message": "File uploaded successfully!", "file": filename})
+# ⏳ Poll an upload's ingestion job
+@document_bp.route("/jobs/<job_id>", methods=["GET"])
+@verify_token()
+def get_ingestion_job(job_id):
+    """Report progress and errors of a background ingestion job"""
+    job = get_job(job_id, request.user_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    job.pop("user_id", None)
+    return jsonify({"job": job})
 
 
 # 📄 Get all documents for authenticated user
@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify
+from backend.config.db_config import get_pool_stats
+from backend.services.ingestion import get_ingestion_stats
+from backend.services.summary_cache import get_summary_cache_stats
+from backend.services.document_text import get_document_text_stats
+from backend.services.langchain_ai import get_llm_client_stats
+from backend.services.semantic_memory import get_query_cache_stats
+from backend.services.text_analysis import get_text_analysis_stats
+from backend.services.quiz_store import get_quiz_store_stats
+from backend.services.chat_history import get_chat_history_stats
+from backend.services.study_tracker import get_study_tracker_stats
+from backend.utils.jwt_utils import verify_token, get_token_cache_stats
+from backend.utils.passwords import get_password_hasher_stats
+
+metrics_bp = Blueprint("metrics_bp", __name__)
+
+@metrics_bp.route("", methods=["GET"])
+@verify_token()
+def metrics():
+    """Operational metrics for the running process"""
+    return jsonify({
+        "db_pool": get_pool_stats(),
+        "ingestion": get_ingestion_stats(),
+        "summary_cache": get_summary_cache_stats(),
+        "document_text_cache": get_document_text_stats(),
+        "llm": get_llm_client_stats(),
+        "semantic_memory": get_query_cache_stats(),
+        "text_analysis": get_text_analysis_stats(),
+        "quiz_store": get_quiz_store_stats(),
+        "chat_history": get_chat_history_stats(),
+        "study_tracker": get_study_tracker_stats(),
+        "token_cache": get_token_cache_stats(),
+        "password_hasher": get_password_hasher_stats(),
+    })
@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify, request
 from backend.utils.jwt_utils import verify_token
-from backend.models.document_model import get_document_by_id
-from backend.services.file_reader import read_text_from_file
-from backend.services.langchain_ai import generate_quiz_from_text_langchain
+from backend.services.document_text import get_document_entry
+from backend.services.langchain_ai import generate_quiz_with_provider, get_chat_provider
+from backend.services.quiz_store import lookup_quiz, store_quiz
 
 # Krijo Blueprint për quiz routes
 quiz_bp = Blueprint('quiz', __name__)
@@ -29,26 +29,48 @@ def generate_quiz():
         document_id = data.get('document_id')
         document_text = data.get('text')
 
+        regenerate = bool(data.get('regenerate'))
+
         extraction_warning = None
+        entry = None
         if document_id:
-            doc = get_document_by_id(document_id, request.user_id)
-            if not doc:
+            entry = get_document_entry(document_id, request.user_id)
+            if entry is None:
                 return jsonify({"error": "Document not found"}), 404
-            # Prefer stored DB content; fallback to reading file
-            document_text = (doc.get('content') or '').strip() or document_text
+            # Prefer stored DB content (or the file, re-extracted once); fallback to provided text
+            document_text = entry["text"] or document_text
             if not document_text:
-                extracted = read_text_from_file(doc.get('file_path'))
-                if not extracted:
-                    extraction_warning = "Could not extract text from document; returning generic questions."
-                    document_text = None
-                else:
-                    document_text = extracted
+                extraction_warning = "Could not extract text from document; returning generic questions."
+                document_text = None
+
+        # Quizzes generated from a stored document are saved and reused for the same
+        # (content, num_questions, provider) unless the caller asks to regenerate.
+        # They are saved under the provider that actually wrote them, so offline fallback
+        # questions are never served to callers expecting the LLM's
+        quiz_id = None
+        cached = False
+        cache_key = None
+        provider = get_chat_provider()
+        if entry is not None and entry["text"]:
+            cache_key = (entry["content_hash"], num_questions, provider)
 
         # If there is still no text (no document_id and no text), proceed with generic questions
         if document_text:
-            sample_questions = generate_quiz_from_text_langchain(document_text, num_questions=num_questions)
+            stored = lookup_quiz(*cache_key, document_id) if cache_key and not regenerate else None
+            if stored is not None:
+                quiz_id, sample_questions = stored
+                cached = True
+                if quiz_id is None:
+                    # Same content generated for another document: reuse the questions in a quiz of our own
+                    quiz_id = store_quiz(document_id, entry["filename"] or "Quiz", *cache_key, sample_questions)
+            else:
+                sample_questions, provider = generate_quiz_with_provider(document_text, num_questions=num_questions)
+                if cache_key:
+                    quiz_id = store_quiz(document_id, entry["filename"] or "Quiz", entry["content_hash"],
+                                         num_questions, provider, sample_questions)
         else:
             # Generic fallback
+            provider = "offline"
             sample_questions = [
                 {
                     "id": 1,
@@ -69,6 +91,9 @@ def generate_quiz():
         payload = {
             "message": "Quiz generated successfully",
             "questions": sample_questions,
+            "quiz_id": quiz_id,
+            "cached": cached,
+            "provider": provider,
             "user_id": request.user_id
         }
         if extraction_warning:
@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request
 from backend.utils.jwt_utils import verify_token
-from backend.models.study_model import upsert_active_session, touch_heartbeat, get_stats
+from backend.services.study_tracker import record_heartbeat, get_live_stats, get_daily_history
 from datetime import datetime
 
 study_bp = Blueprint("study", __name__)
@@ -9,14 +9,25 @@ study_bp = Blueprint("study", __name__)
 @verify_token()
 def heartbeat():
     now = datetime.utcnow()
-    upsert_active_session(request.user_id, now)
-    touch_heartbeat(request.user_id, now)
-    stats = get_stats(request.user_id, now)
+    # Counted in memory; study_sessions is updated by the tracker's periodic flush
+    stats = record_heartbeat(request.user_id, now)
     return jsonify({"ok": True, "stats": stats})
 
 @study_bp.route("/stats", methods=["GET"])
 @verify_token()
 def stats():
     now = datetime.utcnow()
-    data = get_stats(request.user_id, now)
+    data = get_live_stats(request.user_id, now)
     return jsonify(data)
+
+@study_bp.route("/history", methods=["GET"])
+@verify_token()
+def history():
+    """Per-day study seconds for the last ?days=N days (default 7, at most 366)"""
+    try:
+        days = int(request.args.get("days", 7))
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    days = max(1, min(days, 366))
+    now = datetime.utcnow()
+    return jsonify({"days": get_daily_history(request.user_id, days, now)})
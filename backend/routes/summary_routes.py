@@ -1,27 +1,92 @@
 from flask import Blueprint, request, jsonify
 from backend.models.summary_model import save_summary
-from backend.services.summarizer import generate_summary
+from backend.services.summarizer import generate_summary, iter_summary
+from backend.services.summary_cache import lookup_summary, store_summary, invalidate_summaries
+from backend.utils.digest import text_digest
+from backend.services.document_text import get_document_entry
+from backend.utils.jwt_utils import verify_token
+from backend.utils.sse import sse_event, sse_response
 import traceback
 
 summary_bp = Blueprint("summary_bp", __name__)
 
+
+def _resolve_text(data):
+    """Return (text, text_hash) from the request body.
+    Without 'text', an authenticated caller's stored document text is used instead.
+    """
+    text = data.get("text")
+    if text:
+        return text, None
+    document_id = data.get("document_id")
+    if document_id and request.user_id is not None:
+        entry = get_document_entry(document_id, request.user_id)
+        if entry and entry["text"]:
+            return entry["text"], entry["content_hash"]
+    return None, None
+
+
 @summary_bp.route("/generate", methods=["POST"])
+@verify_token(optional=True)
 def summarize_document():
     try:
         data = request.get_json(force=True)
         document_id = data.get("document_id")
-        text = data.get("text")
+        text, text_hash = _resolve_text(data)
         length = data.get("length", "medium")
 
         if not document_id or not text:
             return jsonify({"error": "Missing document_id or text"}), 400
 
-        summary_text = generate_summary(text, length)
-        save_summary(document_id, summary_text)
+        summary_text = lookup_summary(text, length, text_hash)
+        cached = summary_text is not None
+        if not cached:
+            summary_text = generate_summary(text, length)
+            store_summary(text, length, summary_text, text_hash)
+            save_summary(document_id, summary_text)
 
-        return jsonify({"success": True, "summary": summary_text}), 200
+        return jsonify({"success": True, "summary": summary_text, "cached": cached}), 200
 
     except Exception as e:
         print("❌ Error in summarization:", e)
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
+
+
+@summary_bp.route("/stream", methods=["POST"])
+@verify_token(optional=True)
+def stream_summary():
+    """Server-Sent Events variant of /generate: one 'partial' event per chunk, then 'final'"""
+    data = request.get_json(force=True)
+    document_id = data.get("document_id")
+    text, text_hash = _resolve_text(data)
+    length = data.get("length", "medium")
+
+    if not document_id or not text:
+        return jsonify({"error": "Missing document_id or text"}), 400
+
+    def _events():
+        cached = lookup_summary(text, length, text_hash)
+        if cached is not None:
+            yield sse_event({"type": "final", "summary": cached, "cached": True}, event="final")
+            return
+        for event in iter_summary(text, length):
+            if event["type"] == "final":
+                store_summary(text, length, event["summary"], text_hash)
+                save_summary(document_id, event["summary"])
+                event = dict(event, cached=False)
+            yield sse_event(event, event=event["type"])
+
+    return sse_response(_events())
+
+
+@summary_bp.route("/cache/invalidate", methods=["POST"])
+@verify_token()
+def invalidate_summary_cache():
+    """Drop cached summaries for the given text (or text_hash)"""
+    data = request.get_json(silent=True) or {}
+    text_hash = data.get("text_hash") or (text_digest(data["text"]) if data.get("text") else None)
+    if not text_hash:
+        return jsonify({"success": False, "error": "Missing text_hash or text"}), 400
+    removed = invalidate_summaries(text_hash)
+    return jsonify({"success": True, "removed": removed}), 200
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
-import bcrypt
 from backend.models.user_model import create_user, get_user_by_email
+from backend.utils.passwords import hash_password, PasswordHasherBusy
 from backend.utils.jwt_utils import verify_token
 
 user_bp = Blueprint("user_bp", __name__)
@@ -23,14 +23,15 @@ def register():
     if get_user_by_email(email):
         return jsonify({"error": "User already exists"}), 400
     
-    # Hash password securely using bcrypt
+    # Hash password securely using bcrypt (on the dedicated hashing pool, cost BCRYPT_ROUNDS)
     try:
-        salt = bcrypt.gensalt()
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        password_hash = hash_password(password)
         
         create_user(name, email, password_hash)
         return jsonify({"message": "User registered successfully!"}), 201
         
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server busy, please retry"}), 503
     except Exception as e:
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
@@ -0,0 +1,136 @@
+import os
+import json
+import math
+import tempfile
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from backend.services.semantic_memory import INDEX_DIR
+from backend.services.text_analysis import get_analysis, tokenize
+from backend.utils.lru_cache import LRUCache
+
+# Sentence-level inverted indexes live next to the FAISS indexes, one per distinct document text
+BM25_DIR = os.path.join(INDEX_DIR, "bm25")
+os.makedirs(BM25_DIR, exist_ok=True)
+
+_loaded = LRUCache(max_entries=int(os.getenv("BM25_CACHE_SIZE", "64")))
+
+
+class SentenceIndex:
+    """BM25 over the sentences of one document.
+
+    postings maps term -> [[sentence_id, term_frequency], ...]; a query only
+    touches the posting lists of its own terms.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, sentences: List[str], lengths: List[int], postings: Dict[str, List[List[int]]]):
+        self.sentences = sentences
+        self.lengths = lengths
+        self.postings = postings
+        self.avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, text: str, content_hash: Optional[str] = None) -> "SentenceIndex":
+        """Build postings from the shared analysis of text (no re-tokenization if it is cached)."""
+        analysis = get_analysis(text, content_hash)
+        vocab = analysis.vocab
+        lengths: List[int] = []
+        postings: Dict[str, List[List[int]]] = {}
+        for sid in range(analysis.sentence_count):
+            lengths.append(analysis.sentence_length(sid))
+            for tid, tf in Counter(analysis.sentence_token_ids(sid)).items():
+                postings.setdefault(vocab[tid], []).append([sid, tf])
+        return cls(analysis.sentences(), lengths, postings)
+
+    def _idf(self, df: int) -> float:
+        n = len(self.sentences)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, idf: float, tf: int, length: int) -> float:
+        norm = self.K1 * (1 - self.B + self.B * length / (self.avgdl or 1.0))
+        return idf * tf * (self.K1 + 1) / (tf + norm)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, int]]:
+        """Return up to k (score, sentence_id) pairs, best first."""
+        n = len(self.sentences)
+        if not n:
+            return []
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self._idf(len(plist))
+            for sid, tf in plist:
+                scores[sid] = scores.get(sid, 0.0) + self._term_score(idf, tf, self.lengths[sid])
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return [(score, sid) for sid, score in ranked[:k]]
+
+    def score_sentences(self, query: str, sentences: List[str]) -> List[float]:
+        """BM25 scores of sentences outside the index, using this index's statistics,
+        so they rank on the same scale as search() results."""
+        terms = set(tokenize(query))
+        out = []
+        for sentence in sentences:
+            tokens = tokenize(sentence)
+            counts = Counter(tokens)
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self._term_score(self._idf(len(self.postings.get(term, ()))), tf, len(tokens))
+            out.append(score)
+        return out
+
+    def to_dict(self) -> dict:
+        return {"sentences": self.sentences, "lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SentenceIndex":
+        return cls(data["sentences"], data["lengths"], data["postings"])
+
+
+def _path(content_hash: str) -> str:
+    # Versioned with the sentence splitter, so indexes built by an older splitter are rebuilt
+    return os.path.join(BM25_DIR, f"{content_hash}.v2.json")
+
+
+def build_sentence_index(content_hash: str, text: str) -> SentenceIndex:
+    """Build, persist and cache the sentence index for a document text."""
+    index = SentenceIndex.build(text, content_hash)
+    path = _path(content_hash)
+    fd, tmp = tempfile.mkstemp(dir=BM25_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _loaded.set(content_hash, index)
+    return index
+
+
+def get_sentence_index(content_hash: str, text: Optional[str] = None) -> Optional[SentenceIndex]:
+    """Load a document's sentence index (memory, then disk); build it from text if it was never built."""
+    index = _loaded.get(content_hash)
+    if index is not None:
+        return index
+    path = _path(content_hash)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = SentenceIndex.from_dict(json.load(f))
+            _loaded.set(content_hash, index)
+            return index
+        except Exception:
+            pass
+    if text:
+        return build_sentence_index(content_hash, text)
+    return None
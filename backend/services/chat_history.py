@@ -0,0 +1,117 @@
+import os
+import atexit
+import base64
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from backend.models.chat_model import save_chat_messages, get_chat_history_page
+
+# Chat turns are buffered in memory and written in batches by a background thread
+FLUSH_SECONDS = float(os.getenv("CHAT_HISTORY_FLUSH_SECONDS", "2"))
+FLUSH_BATCH = max(1, int(os.getenv("CHAT_HISTORY_BATCH", "200")))
+# Oldest turns are dropped beyond this many while the database is unreachable
+MAX_BUFFER = max(FLUSH_BATCH, int(os.getenv("CHAT_HISTORY_MAX_BUFFER", "10000")))
+MAX_PAGE_SIZE = 100
+
+_buffer: List[tuple] = []
+_cond = threading.Condition()
+_flush_lock = threading.Lock()
+_flusher = None
+_stats = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "errors": 0}
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        with _cond:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="chat-history-flush", daemon=True)
+                _flusher.start()
+                atexit.register(flush)
+
+
+def record_chat_turn(user_id: int, message: str, response: str) -> None:
+    """Queue one chat turn for persistence; returns without touching the database."""
+    _ensure_flusher()
+    with _cond:
+        _buffer.append((user_id, message, response, datetime.now()))
+        _stats["queued"] += 1
+        overflow = len(_buffer) - MAX_BUFFER
+        if overflow > 0:
+            del _buffer[:overflow]
+            _stats["dropped"] += overflow
+        if len(_buffer) >= FLUSH_BATCH:
+            _cond.notify()
+
+
+def flush() -> int:
+    """Write everything buffered so far. Returns the number of rows written."""
+    with _flush_lock:
+        with _cond:
+            rows = _buffer[:]
+            del _buffer[:]
+        written = 0
+        for start in range(0, len(rows), FLUSH_BATCH):
+            batch = rows[start:start + FLUSH_BATCH]
+            try:
+                save_chat_messages(batch)
+            except Exception as e:
+                print("⚠️ Chat history flush failed:", e)
+                # Put the unwritten rows back in front of anything queued meanwhile
+                with _cond:
+                    _buffer[:0] = rows[start:]
+                    _stats["errors"] += 1
+                    overflow = len(_buffer) - MAX_BUFFER
+                    if overflow > 0:
+                        del _buffer[:overflow]
+                        _stats["dropped"] += overflow
+                break
+            written += len(batch)
+            with _cond:
+                _stats["written"] += len(batch)
+                _stats["batches"] += 1
+        return written
+
+
+def _flush_loop() -> None:
+    while True:
+        with _cond:
+            _cond.wait_for(lambda: len(_buffer) >= FLUSH_BATCH, timeout=FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception:
+            pass
+
+
+def _encode_cursor(row: dict) -> str:
+    return base64.urlsafe_b64encode(str(row["id"]).encode("ascii")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii"))
+
+
+def get_history_page(user_id: int, limit: int = 20, cursor: Optional[str] = None) -> dict:
+    """One page of a user's persisted chat turns, newest first, plus the cursor of the next page.
+    Raises ValueError on a malformed cursor. Turns still in the write buffer are not included.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    before_id = _decode_cursor(cursor) if cursor else None
+    rows = get_chat_history_page(user_id, limit + 1, before_id)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    messages = [{
+        "id": r["id"],
+        "message": r["message"],
+        "response": r["response"],
+        "timestamp": r["timestamp"].isoformat() if r.get("timestamp") else None,
+    } for r in rows]
+    return {"messages": messages, "next_cursor": _encode_cursor(rows[-1]) if has_more else None}
+
+
+def get_chat_history_stats() -> dict:
+    with _cond:
+        stats = dict(_stats)
+        stats["buffered"] = len(_buffer)
+    return stats
@@ -0,0 +1,92 @@
+import os
+import mmap
+import threading
+from array import array
+from typing import Iterable, List
+
+
+class ChunkStore:
+    """On-disk store of chunk texts addressed by their position in a vector index.
+
+    Texts live in one UTF-8 blob (``<base>.chunks.bin``) read through ``mmap``;
+    ``<base>.chunks.idx`` holds a flat array of (offset, length) int64 pairs.
+    Appends only touch the tail of both files, so a lookup never loads more
+    than the chunks it asks for.
+    """
+
+    def __init__(self, base_path: str):
+        self.blob_path = base_path + ".chunks.bin"
+        self.offsets_path = base_path + ".chunks.idx"
+        self._lock = threading.Lock()
+        self._offsets = array("q")
+        self._mmap = None
+        self._blob_file = None
+        if os.path.exists(self.offsets_path) and os.path.exists(self.blob_path):
+            with open(self.offsets_path, "rb") as f:
+                self._offsets.frombytes(f.read())
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def _close_map(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._blob_file is not None:
+            self._blob_file.close()
+            self._blob_file = None
+
+    def _map(self):
+        if self._mmap is None:
+            if not os.path.exists(self.blob_path) or os.path.getsize(self.blob_path) == 0:
+                return None
+            self._blob_file = open(self.blob_path, "rb")
+            self._mmap = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def append(self, texts: Iterable[str]) -> None:
+        with self._lock:
+            self._close_map()
+            new = array("q")
+            with open(self.blob_path, "ab") as blob:
+                offset = blob.tell()
+                for text in texts:
+                    data = text.encode("utf-8")
+                    blob.write(data)
+                    new.append(offset)
+                    new.append(len(data))
+                    offset += len(data)
+            with open(self.offsets_path, "ab") as f:
+                f.write(new.tobytes())
+            self._offsets.extend(new)
+
+    def get(self, position: int) -> str:
+        with self._lock:
+            if position < 0 or position >= len(self):
+                raise IndexError(position)
+            buf = self._map()
+            offset, length = self._offsets[2 * position], self._offsets[2 * position + 1]
+            if buf is None or length == 0:
+                return ""
+            return buf[offset:offset + length].decode("utf-8", errors="ignore")
+
+    def remove(self, positions: Iterable[int]) -> None:
+        """Drop chunks and compact, mirroring FAISS IndexFlat.remove_ids."""
+        dropped = set(positions)
+        if not dropped:
+            return
+        kept: List[str] = [self.get(i) for i in range(len(self)) if i not in dropped]
+        self.reset()
+        self.append(kept)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._close_map()
+            for path in (self.blob_path, self.offsets_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._offsets = array("q")
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_map()
@@ -0,0 +1,96 @@
+import os
+import re
+import hashlib
+import tempfile
+from typing import Optional
+
+# Content-addressed cache of ingestion artifacts, shared by every user and document.
+# Extracted text is keyed by the sha256 of the uploaded file; derived artifacts
+# (embeddings, ...) are keyed by the sha256 of the extracted text.
+CAS_DIR = os.path.join("uploads", "cas")
+os.makedirs(CAS_DIR, exist_ok=True)
+
+_STREAM_CHUNK = 1024 * 1024
+
+
+def save_stream_hashed(stream, dest_path: str) -> str:
+    """Copy an upload stream to dest_path, hashing it on the way. Returns the sha256 hex digest."""
+    h = hashlib.sha256()
+    with open(dest_path, "wb") as out:
+        while True:
+            block = stream.read(_STREAM_CHUNK)
+            if not block:
+                break
+            h.update(block)
+            out.write(block)
+    return h.hexdigest()
+
+
+def _path(digest: str, suffix: str) -> str:
+    folder = os.path.join(CAS_DIR, digest[:2])
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, digest + suffix)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    # A unique temp file per writer: concurrent jobs storing the same artifact never collide
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def read_artifact(digest: str, suffix: str) -> Optional[bytes]:
+    """Raw bytes of a cached artifact, or None."""
+    path = _path(digest, suffix)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_artifact(digest: str, suffix: str, data: bytes) -> None:
+    _write_atomic(_path(digest, suffix), data)
+
+
+def get_extracted_text(file_digest: str) -> Optional[str]:
+    path = _path(file_digest, ".txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def put_extracted_text(file_digest: str, text: str) -> None:
+    _write_atomic(_path(file_digest, ".txt"), (text or "").encode("utf-8"))
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+def get_embeddings(text_hash: str, model_name: str):
+    """Return the cached chunk embedding matrix for a text, or None."""
+    path = _path(text_hash, f".{_model_slug(model_name)}.npy")
+    if not os.path.exists(path):
+        return None
+    try:
+        import numpy as np  # type: ignore
+        return np.load(path)
+    except Exception:
+        return None
+
+
+def put_embeddings(text_hash: str, model_name: str, vecs) -> None:
+    import io
+    import numpy as np  # type: ignore
+    buf = io.BytesIO()
+    np.save(buf, vecs)
+    _write_atomic(_path(text_hash, f".{_model_slug(model_name)}.npy"), buf.getvalue())
@@ -0,0 +1,101 @@
+import math
+import random
+from typing import Dict, List, Optional
+
+from backend.services.text_analysis import get_analysis
+
+# Terms in more than this share of the candidate sentences carry no signal and are not indexed
+MAX_DF_RATIO = 0.2
+# Postings scanned per query term; keeps a lookup flat on long documents
+MAX_POSTINGS = 64
+# Random probes when the similarity ranking yields too few distinct candidates
+_RANDOM_PROBES = 24
+
+
+class DistractorIndex:
+    """Candidate answer sentences of one text with an inverted index over their terms.
+
+    Built once per text (memoized on its analysis); choosing distractors for a question
+    scores only the sentences that share a term with the correct answer.
+    """
+
+    def __init__(self, analysis, min_chars: int = 20):
+        self.sentences: List[str] = []
+        self.terms: List[frozenset] = []
+        seen = set()
+        for sid in range(analysis.sentence_count):
+            s = analysis.sentence(sid)
+            if len(s) <= min_chars or s.lower() in seen:
+                continue
+            seen.add(s.lower())
+            self.sentences.append(s)
+            self.terms.append(frozenset(analysis.sentence_token_ids(sid)))
+
+        n = len(self.sentences)
+        df: Dict[int, int] = {}
+        for terms in self.terms:
+            for t in terms:
+                df[t] = df.get(t, 0) + 1
+        max_df = max(2, int(MAX_DF_RATIO * n))
+        self.idf = {t: math.log(1 + n / c) for t, c in df.items() if c <= max_df}
+        self.postings: Dict[int, List[int]] = {t: [] for t in self.idf}
+        for pos, terms in enumerate(self.terms):
+            for t in terms:
+                plist = self.postings.get(t)
+                if plist is not None:
+                    plist.append(pos)
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def _similar(self, pos: int, rng: random.Random) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for t in self.terms[pos]:
+            plist = self.postings.get(t)
+            if not plist:
+                continue
+            if len(plist) > MAX_POSTINGS:
+                start = rng.randrange(len(plist))
+                plist = [plist[(start + j) % len(plist)] for j in range(MAX_POSTINGS)]
+            w = self.idf[t]
+            for other in plist:
+                if other != pos:
+                    scores[other] = scores.get(other, 0.0) + w
+        return scores
+
+    def distractors(self, pos: int, k: int = 3, rng: Optional[random.Random] = None) -> List[str]:
+        """Up to k sentences most lexically similar to sentence pos, without near-copies of it."""
+        rng = rng or random
+        correct = self.terms[pos]
+        picked: List[int] = []
+        scores = self._similar(pos, rng)
+        # Normalise by length so long sentences do not win on size alone
+        ranked = sorted(
+            scores.items(),
+            key=lambda x: -x[1] / math.sqrt((len(self.terms[x[0]]) or 1) * (len(correct) or 1)),
+        )
+        for other, _ in ranked:
+            if len(picked) == k:
+                break
+            terms = self.terms[other]
+            # Skip paraphrases of the answer: they would also be correct
+            if correct and len(correct & terms) / len(correct | terms) > 0.8:
+                continue
+            picked.append(other)
+        # Top up with random sentences, sampled by index instead of copying the pool
+        probes = 0
+        n = len(self.sentences)
+        while len(picked) < k and n > len(picked) + 1 and probes < _RANDOM_PROBES:
+            probes += 1
+            other = rng.randrange(n)
+            if other != pos and other not in picked:
+                picked.append(other)
+        return [self.sentences[i] for i in picked]
+
+
+def get_distractor_index(text: str) -> DistractorIndex:
+    analysis = get_analysis(text or "")
+    index = analysis.memo.get("distractors")
+    if index is None:
+        index = analysis.memo["distractors"] = DistractorIndex(analysis)
+    return index
@@ -0,0 +1,60 @@
+import os
+import sys
+from typing import Optional
+
+from backend.models.document_model import get_document_by_id
+from backend.utils.digest import text_digest
+from backend.services.file_reader import read_text_from_file
+from backend.utils.lru_cache import LRUCache
+
+# Byte budget for extracted document texts kept in memory
+DOCUMENT_TEXT_CACHE_MB = int(os.getenv("DOCUMENT_TEXT_CACHE_MB", "64"))
+
+_cache = LRUCache(
+    max_entries=4096,
+    max_bytes=DOCUMENT_TEXT_CACHE_MB * 1024 * 1024,
+    sizeof=lambda entry: sys.getsizeof(entry["text"]),
+)
+
+
+def get_document_entry(document_id: int, user_id: int) -> Optional[dict]:
+    """
+    Return {'text', 'content_hash', 'filename'} for a document the user owns, or None.
+    Text comes from documents.content (falling back to re-extracting the file only
+    when nothing was stored) and is kept in a byte-bounded LRU, so repeated
+    requests for the same document skip both MySQL and the file.
+    """
+    key = int(document_id)
+    entry = _cache.get(key)
+    if entry is not None:
+        return entry if entry["user_id"] == user_id else None
+
+    doc = get_document_by_id(document_id, user_id)
+    if not doc:
+        return None
+    text = (doc.get("content") or "").strip()
+    content_hash = doc.get("content_hash") if text else None
+    if not text:
+        text = (read_text_from_file(doc.get("file_path")) or "").strip()
+    entry = {
+        "user_id": user_id,
+        "text": text,
+        "content_hash": content_hash or text_digest(text),
+        "filename": doc.get("filename"),
+    }
+    _cache.set(key, entry)
+    return entry
+
+
+def get_document_text(document_id: int, user_id: int) -> Optional[str]:
+    """Text of a document the user owns; None if it does not exist or belongs to someone else."""
+    entry = get_document_entry(document_id, user_id)
+    return entry["text"] if entry is not None else None
+
+
+def invalidate_document_text(document_id: int) -> None:
+    _cache.pop(int(document_id))
+
+
+def get_document_text_stats() -> dict:
+    return _cache.stats()
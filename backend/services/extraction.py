@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Iterator, List, Optional
+
+# Pages where PyPDF2 finds fewer characters than this are re-read with pdfplumber
+PAGE_FALLBACK_CHARS = int(os.getenv("PDF_PAGE_FALLBACK_CHARS", "40"))
+# Worker processes for large PDFs; 0 or 1 extracts in the calling thread
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+# Page range handed to one worker task
+PAGES_PER_TASK = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "25")))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _iter_plumber_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    import pdfplumber  # type: ignore
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text() or ""
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each page in [start, stop), parsing the file once.
+
+    Every page is read with PyPDF2; only pages that come back (nearly) empty are
+    re-read with pdfplumber, which is opened lazily the first time it is needed.
+    """
+    try:
+        from PyPDF2 import PdfReader  # type: ignore
+        reader = PdfReader(file_path)
+    except Exception:
+        # PyPDF2 cannot parse the file at all: let pdfplumber handle every page
+        yield from _iter_plumber_pages(file_path, start, stop)
+        return
+
+    total = len(reader.pages)
+    stop = total if stop is None else min(stop, total)
+    plumber = None
+    try:
+        for i in range(start, stop):
+            try:
+                text = reader.pages[i].extract_text() or ""
+            except Exception:
+                text = ""
+            if len(text.strip()) < PAGE_FALLBACK_CHARS:
+                try:
+                    if plumber is None:
+                        import pdfplumber  # type: ignore
+                        plumber = pdfplumber.open(file_path)
+                    alt = plumber.pages[i].extract_text() or ""
+                    if len(alt.strip()) > len(text.strip()):
+                        text = alt
+                except Exception:
+                    pass
+            yield text
+    finally:
+        if plumber is not None:
+            plumber.close()
+
+
+def _pdf_page_count(file_path: str) -> int:
+    try:
+        from PyPDF2 import PdfReader  # type: ignore
+        return len(PdfReader(file_path).pages)
+    except Exception:
+        return 0
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    return list(iter_pdf_pages(file_path, start, stop))
+
+
+def _read_docx(file_path: str) -> str:
+    try:
+        import docx2txt  # type: ignore
+        return docx2txt.process(file_path) or ""
+    except Exception:
+        from docx import Document  # type: ignore
+        return "\n".join(p.text for p in Document(file_path).paragraphs)
+
+
+def iter_text(file_path: str) -> Iterator[str]:
+    """Yield a document's text piece by piece (one piece per page for PDFs)."""
+    _, ext = os.path.splitext(file_path.lower())
+    if ext == ".pdf":
+        yield from iter_pdf_pages(file_path)
+    elif ext == ".docx":
+        yield _read_docx(file_path)
+    elif ext == ".txt":
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            yield f.read()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def extract_text(file_path: str) -> str:
+    """Extract a PDF, DOCX or TXT file's text. Raises on unreadable files.
+
+    PDFs longer than PDF_PAGES_PER_TASK pages are split into page ranges and
+    extracted on a process pool when PDF_EXTRACT_WORKERS > 1.
+    """
+    if file_path.lower().endswith(".pdf") and EXTRACT_WORKERS > 1:
+        pages = _pdf_page_count(file_path)
+        if pages > PAGES_PER_TASK:
+            ranges = [(s, min(s + PAGES_PER_TASK, pages)) for s in range(0, pages, PAGES_PER_TASK)]
+            futures = [_get_pool().submit(_extract_page_range, file_path, s, e) for s, e in ranges]
+            return "\n".join(t for fut in futures for t in fut.result()).strip()
+    return "\n".join(iter_text(file_path)).strip()
@@ -0,0 +1,133 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from backend.models.document_model import save_document
+from backend.services.content_store import get_extracted_text, put_extracted_text
+from backend.utils.digest import text_digest
+from backend.services.semantic_memory import index_document
+from backend.services.bm25_index import build_sentence_index
+from backend.services.text_analysis import get_analysis
+
+# Worker threads running extraction, persistence and indexing off the request path
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Finished jobs stay queryable for this long
+JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", "3600"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs: Dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS), thread_name_prefix="ingest")
+    return _executor
+
+
+def _update(job_id: str, **fields) -> None:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+            job["updated_at"] = time.time()
+
+
+def _prune() -> None:
+    cutoff = time.time() - JOB_TTL_SECONDS
+    with _jobs_lock:
+        for job_id in [j for j, job in _jobs.items() if job["status"] in ("done", "failed") and job["updated_at"] < cutoff]:
+            del _jobs[job_id]
+
+
+def _run(job_id: str, user_id: int, filename: str, file_path: str, file_hash: Optional[str],
+         extract_text: Callable[[str], str]) -> None:
+    try:
+        # Identical uploads reuse the text extracted the first time
+        text_content = get_extracted_text(file_hash) if file_hash else None
+        if text_content is None:
+            _update(job_id, status="extracting", progress=10)
+            text_content = extract_text(file_path)
+            if file_hash and text_content:
+                put_extracted_text(file_hash, text_content)
+        else:
+            _update(job_id, deduplicated=True)
+        content_hash = text_digest(text_content)
+
+        _update(job_id, status="saving", progress=60)
+        document_id = save_document(user_id, filename, file_path, text_content, content_hash)
+        _update(job_id, document_id=document_id)
+
+        # Indexing is best-effort: the document is usable even if embedding fails
+        _update(job_id, status="indexing", progress=75)
+        try:
+            # Sentence boundaries, token ids and term frequencies shared by summary, quiz and chat
+            get_analysis(text_content, content_hash)
+            build_sentence_index(content_hash, text_content)
+        except Exception as e:
+            _update(job_id, warning=f"Sentence indexing failed: {e}")
+        try:
+            chunks = index_document(user_id, document_id, text_content, filename, content_hash)
+            _update(job_id, chunks_indexed=chunks)
+        except Exception as e:
+            _update(job_id, warning=f"Semantic indexing failed: {e}")
+
+        _update(job_id, status="done", progress=100)
+    except Exception as e:
+        traceback.print_exc()
+        _update(job_id, status="failed", error=str(e))
+
+
+def submit_ingestion(user_id: int, filename: str, file_path: str, extract_text: Callable[[str], str],
+                     file_hash: Optional[str] = None) -> str:
+    """
+    Queue a saved upload for extraction, persistence and indexing.
+    extract_text: function (file_path: str) -> str
+    file_hash: sha256 of the bytes at file_path; when given, extraction results are shared
+    with every other upload of the same file. file_path must be private to this upload
+    so the extracted bytes are the hashed ones.
+    Returns the job id to poll with get_job.
+    """
+    _prune()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _jobs_lock:
+        _jobs[job_id] = {
+            "id": job_id,
+            "user_id": user_id,
+            "filename": filename,
+            "status": "queued",
+            "progress": 0,
+            "document_id": None,
+            "error": None,
+            "deduplicated": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+    _get_executor().submit(_run, job_id, user_id, filename, file_path, file_hash, extract_text)
+    return job_id
+
+
+def get_job(job_id: str, user_id: int) -> Optional[dict]:
+    """Return a snapshot of the job, or None if unknown or owned by another user."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return dict(job)
+
+
+def get_ingestion_stats() -> dict:
+    with _jobs_lock:
+        counts: Dict[str, int] = {}
+        for job in _jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return {"workers": max(1, INGEST_WORKERS), "jobs": counts}
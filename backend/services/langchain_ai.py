@@ -1,126 +1,345 @@
 import os
 import json
-from typing import List, Dict, Optional
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend.services.distractors import get_distractor_index
+from backend.services.text_analysis import get_analysis, tokenize
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 
-def _load_chat_model():
-    if not OPENAI_API_KEY:
-        return None
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo-0125")
+
+# Quiz generation fans out one LLM request per section of at most this many characters
+QUIZ_SECTION_CHARS = max(2000, int(os.getenv("QUIZ_SECTION_CHARS", "12000")))
+# At most this many sections per quiz; longer documents are sampled evenly across their length
+QUIZ_MAX_SECTIONS = max(1, int(os.getenv("QUIZ_MAX_SECTIONS", "8")))
+# Upper bound on LLM quiz requests in flight across the whole process
+QUIZ_LLM_CONCURRENCY = max(1, int(os.getenv("QUIZ_LLM_CONCURRENCY", "4")))
+
+# Process-wide registry of chat clients, one per (model, temperature).
+# Each client is built once and keeps its HTTP connection pool for the life of the process.
+_clients: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+_FAILED = object()
+_quiz_executor = None
+_quiz_executor_lock = threading.Lock()
+
+
+def _build_chat_model(model: str, temperature: float):
     try:
         from langchain_openai import ChatOpenAI
-        return ChatOpenAI(model=os.getenv("CHAT_MODEL", "gpt-3.5-turbo-0125"), temperature=0.2, api_key=OPENAI_API_KEY)
+        return ChatOpenAI(model=model, temperature=temperature, api_key=OPENAI_API_KEY)
     except Exception:
         try:
             from langchain.chat_models import ChatOpenAI  # older langchain
-            return ChatOpenAI(model_name=os.getenv("CHAT_MODEL", "gpt-3.5-turbo-0125"), temperature=0.2, openai_api_key=OPENAI_API_KEY)
+            return ChatOpenAI(model_name=model, temperature=temperature, openai_api_key=OPENAI_API_KEY)
         except Exception:
             return None
 
 
+def _load_chat_model(model: Optional[str] = None, temperature: float = 0.2):
+    """Return the shared client for this model, building it on first use (None when offline)."""
+    if not OPENAI_API_KEY:
+        return None
+    key = (model or CHAT_MODEL, temperature)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                # Remember failures too, so a missing package is not re-imported on every request
+                client = _build_chat_model(*key) or _FAILED
+                _clients[key] = client
+    return None if client is _FAILED else client
+
+
 def get_chat_provider() -> str:
-    """Return 'openai' if ChatOpenAI is available and key is set, else 'offline'."""
-    try:
-        llm = _load_chat_model()
-        return "openai" if llm is not None else "offline"
-    except Exception:
+    """Return 'openai' if ChatOpenAI is available and key is set, else 'offline'.
+    Never constructs a client: it reports on the registry or checks the packages are importable.
+    """
+    if not OPENAI_API_KEY:
         return "offline"
+    client = _clients.get((CHAT_MODEL, 0.2))
+    if client is not None:
+        return "offline" if client is _FAILED else "openai"
+    import importlib.util
+    for module in ("langchain_openai", "langchain.chat_models"):
+        try:
+            if importlib.util.find_spec(module) is not None:
+                return "openai"
+        except Exception:
+            continue
+    return "offline"
 
-def _extractive_answer(message: str, context: Optional[str]) -> str:
+
+def get_llm_client_stats() -> dict:
+    with _clients_lock:
+        built = [{"model": m, "temperature": t, "ready": c is not _FAILED} for (m, t), c in _clients.items()]
+    return {"provider": get_chat_provider(), "clients": built}
+
+
+_SUMMARY_KEYWORDS = ["key", "main", "important", "summary", "purpose", "definition"]
+
+
+def _compose_answer(top: List[str]) -> str:
+    # De-duplicate while preserving order
+    seen = set()
+    unique = []
+    for s in top:
+        k = s.lower()
+        if k not in seen:
+            seen.add(k)
+            unique.append(s)
+    answer = " ".join(unique)
+    # Light cleanup
+    answer = " ".join(answer.split())
+    # Keep it reasonably short
+    return answer[:800]
+
+
+def _indexed_answer(message: str, sentence_index, memory: Optional[str] = None) -> str:
+    """Answer from a document's prebuilt BM25 sentence index: only the query terms' posting lists are read.
+    Sentences of the retrieved memory chunks are scored with the same index's statistics and merged in.
+    """
+    scored = [(score, sid, sentence_index.sentences[sid]) for score, sid in sentence_index.search(message, k=8)]
+    if memory:
+        extra = get_analysis(memory).sentences()
+        base = len(sentence_index.sentences)
+        for i, (score, s) in enumerate(zip(sentence_index.score_sentences(message, extra), extra)):
+            if score > 0:
+                scored.append((score, base + i, s))
+    if not scored:
+        return _compose_answer(sentence_index.sentences[:4])
+    boosted = []
+    for score, sid, s in scored:
+        # Boost for sentences that contain classic summary keywords
+        if any(k in s.lower() for k in _SUMMARY_KEYWORDS):
+            score *= 1.2
+        boosted.append((score, sid, s))
+    boosted.sort(key=lambda x: (-x[0], x[1]))
+    return _compose_answer([s for _, _, s in boosted[:4]])
+
+
+def _extractive_answer(message: str, context: Optional[str], sentence_index=None, memory: Optional[str] = None) -> str:
     """Compose a concise, grounded answer without calling an LLM.
     Strategy: split context into sentences, score by keyword overlap with the query,
     pick top sentences (1-4), and compress into a single paragraph.
+    With a document's sentence_index (see bm25_index), sentences are ranked by BM25
+    through posting-list lookups instead of scanning the whole context; memory, the
+    retrieved chunks included in context, is ranked alongside it.
     """
-    import re
+    if sentence_index is not None and sentence_index.sentences:
+        return _indexed_answer(message, sentence_index, memory)
     if not context:
         return (
             "I'm working offline right now and can't call an LLM. "
             "Please ask a more specific question or provide more context."
         )
-    q_words = set(re.findall(r"[A-Za-zÀ-ÿ0-9']+", (message or '').lower()))
-    sents = re.split(r"(?<=[.!?])\s+|\n+", context)
+    # Sentences and token ids come from the shared analysis (kept in memory only: no content hash)
+    analysis = get_analysis(context)
+    q_ids = analysis.term_ids(tokenize(message or ''))
     scored = []
-    for s in sents:
-        sw = set(re.findall(r"[A-Za-zÀ-ÿ0-9']+", s.lower()))
-        if not sw:
-            continue
-        overlap = len(q_words & sw) / (len(sw) + 1e-6)
+    for sid in range(analysis.sentence_count):
+        s = analysis.sentence(sid)
+        sw = set(analysis.sentence_token_ids(sid))
+        overlap = len(q_ids & sw) / (len(sw) + 1e-6)
         # Boost for sentences that contain classic summary keywords
-        if any(k in s.lower() for k in ["key", "main", "important", "summary", "purpose", "definition"]):
+        if any(k in s.lower() for k in _SUMMARY_KEYWORDS):
             overlap *= 1.2
-        scored.append((overlap, s.strip()))
+        scored.append((overlap, s))
     if not scored:
         return (
             "I'm working offline and couldn't match your question to the document. "
             "Try asking about key topics, definitions, or sections."
         )
     scored.sort(key=lambda x: x[0], reverse=True)
-    top = [s for _, s in scored[:4]]
-    # De-duplicate while preserving order
-    seen = set()
-    unique = []
-    for s in top:
-        k = s.lower()
-        if k not in seen:
-            seen.add(k)
-            unique.append(s)
-    answer = " ".join(unique)
-    # Light cleanup
-    answer = " ".join(answer.split())
-    # Keep it reasonably short
-    return answer[:800]
+    return _compose_answer([s for _, s in scored[:4]])
+
 
+def _chat_prompt(message: str, context: Optional[str]):
+    from langchain.prompts import ChatPromptTemplate
+    tmpl = ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful study tutor. Use the provided context if relevant. Be concise and clear."),
+        ("system", "Context:\n{context}"),
+        ("human", "{question}")
+    ])
+    return tmpl.format_messages(context=(context or "(no context)"), question=message)
 
-def chat_with_context(message: str, context: Optional[str]) -> str:
+
+def chat_with_context(message: str, context: Optional[str], sentence_index=None, memory: Optional[str] = None) -> str:
+    """sentence_index: optional BM25 index of the selected document, used by the offline answerer
+    together with memory, the semantic-memory chunks appended to context.
+    """
     llm = _load_chat_model()
     if llm is None:
-        return _extractive_answer(message, context)
+        return _extractive_answer(message, context, sentence_index, memory)
     try:
-        from langchain.prompts import ChatPromptTemplate
-        tmpl = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful study tutor. Use the provided context if relevant. Be concise and clear."),
-            ("system", "Context:\n{context}"),
-            ("human", "{question}")
-        ])
-        prompt = tmpl.format_messages(context=(context or "(no context)"), question=message)
-        resp = llm.invoke(prompt)
+        resp = llm.invoke(_chat_prompt(message, context))
         return resp.content.strip()
     except Exception:
         # Fall back to extractive if LLM fails
-        return _extractive_answer(message, context)
+        return _extractive_answer(message, context, sentence_index, memory)
+
+
+def _stream_words(text: str) -> Iterator[str]:
+    """Emit a finished answer word by word, so offline replies use the same protocol as the LLM."""
+    import re
+    for m in re.finditer(r"\S+\s*", text):
+        yield m.group(0)
+
+
+def stream_chat_with_context(message: str, context: Optional[str], sentence_index=None,
+                             memory: Optional[str] = None) -> Iterator[str]:
+    """Like chat_with_context, but yields the reply in pieces as the model generates them."""
+    llm = _load_chat_model()
+    if llm is None:
+        yield from _stream_words(_extractive_answer(message, context, sentence_index, memory))
+        return
+    started = False
+    try:
+        for chunk in llm.stream(_chat_prompt(message, context)):
+            piece = getattr(chunk, "content", chunk)
+            if piece:
+                started = True
+                yield piece
+    except Exception:
+        # Once tokens have gone out the reply cannot be swapped; otherwise fall back to extractive
+        if started:
+            raise
+        yield from _stream_words(_extractive_answer(message, context, sentence_index, memory))
+
 
+def _get_quiz_executor():
+    global _quiz_executor
+    if _quiz_executor is None:
+        with _quiz_executor_lock:
+            if _quiz_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _quiz_executor = ThreadPoolExecutor(max_workers=QUIZ_LLM_CONCURRENCY, thread_name_prefix="quiz-llm")
+    return _quiz_executor
 
-def generate_quiz_from_text_langchain(text: str, num_questions: int = 6) -> List[Dict]:
+
+def _split_sections(text: str, max_chars: int) -> List[str]:
+    """Cut text into consecutive sections of whole sentences, each at most max_chars.
+    A single sentence longer than max_chars is cut by characters.
+    """
+    analysis = get_analysis(text)
+    sections, start, end = [], None, None
+    for i in range(analysis.sentence_count):
+        s_start, s_end = analysis.spans[2 * i], analysis.spans[2 * i + 1]
+        if start is not None and s_end - start > max_chars:
+            sections.append(text[start:end])
+            start = None
+        if start is None:
+            start = s_start
+        end = s_end
+    if start is not None:
+        sections.append(text[start:end])
+    capped = []
+    for sec in sections or [text]:
+        capped.extend(sec[i:i + max_chars] for i in range(0, len(sec), max_chars))
+    return capped or [text[:max_chars]]
+
+
+def _pick_sections(sections: List[str], limit: int) -> List[str]:
+    """At most limit sections, spread evenly from the start to the end of the document."""
+    if len(sections) <= limit:
+        return sections
+    if limit == 1:
+        return sections[:1]
+    step = (len(sections) - 1) / (limit - 1)
+    return [sections[round(i * step)] for i in range(limit)]
+
+
+def _allocate_questions(sizes: List[int], total: int) -> List[int]:
+    """Split total questions across sections in proportion to their size (largest remainder)."""
+    weight = sum(sizes) or 1
+    quotas = [total * size / weight for size in sizes]
+    counts = [int(q) for q in quotas]
+    by_remainder = sorted(range(len(sizes)), key=lambda i: (-(quotas[i] - counts[i]), i))
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _llm_quiz_questions(llm, doc: str, n: int) -> List[Dict]:
+    """One LLM request for n questions about doc; returns the parsed question objects."""
+    from langchain.prompts import ChatPromptTemplate
+    tmpl = ChatPromptTemplate.from_messages([
+        ("system", "You generate quizzes as valid JSON. No extra commentary."),
+        ("system", "Return a JSON array of objects with: question (string), options (array of 4 strings), correct_index (0-3)."),
+        ("system", "Ensure options are plausible and distinct. Focus on key concepts from the text."),
+        ("human", "Create {n} multiple-choice questions from this text.\nTEXT:\n{doc}")
+    ])
+    prompt = tmpl.format_messages(n=n, doc=doc)
+    resp = llm.invoke(prompt)
+    raw = resp.content.strip()
+    # Try direct parse, then attempt to repair by extracting JSON array
+    try:
+        data = json.loads(raw)
+    except Exception:
+        import re
+        m = re.search(r"\[.*\]", raw, re.S)
+        if not m:
+            raise ValueError("No JSON array found in LLM output")
+        data = json.loads(m.group(0))
+    return [q for q in data if isinstance(q, dict)]
+
+
+def _llm_quiz_fanout(llm, text: str, num_questions: int) -> List[Dict]:
+    """Ask for each section's share of the questions concurrently; results stay in document order."""
+    # Prompt size stays bounded: sections are capped in length and in number
+    sections = _pick_sections(_split_sections(text, QUIZ_SECTION_CHARS), min(QUIZ_MAX_SECTIONS, num_questions))
+    counts = _allocate_questions([len(sec) for sec in sections], num_questions)
+    if len(sections) == 1:
+        return _llm_quiz_questions(llm, sections[0], num_questions)
+    executor = _get_quiz_executor()
+    futures = [executor.submit(_llm_quiz_questions, llm, sec, n) for sec, n in zip(sections, counts) if n > 0]
+    merged: List[Dict] = []
+    for fut in futures:
+        try:
+            merged.extend(fut.result())
+        except Exception:
+            # A failed section is padded by the caller rather than failing the whole quiz
+            continue
+    return merged
+
+
+def generate_quiz_with_provider(text: str, num_questions: int = 6) -> Tuple[List[Dict], str]:
+    """(questions, provider) where provider names what actually wrote the questions:
+    'openai', 'offline' when the LLM was unavailable or failed, or 'mixed' when LLM
+    questions were padded with offline ones.
+    """
     def _simple_mcq_from_text(t: str, n: int) -> List[Dict]:
-        import re, random
+        import random
         stems = [
             "According to the document, which statement is true?",
             "Which option is best supported by the document?",
             "Which statement best reflects the document's content?",
             "What conclusion is supported by the document?",
         ]
-        # Extract sentences
-        sents = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", (t or "")) if len(s.strip()) > 20]
-        if not sents:
-            sents = [
-                "This document discusses key concepts and definitions.",
-                "It presents examples and main ideas.",
-                "It concludes with important takeaways.",
-                "It introduces important terminology and context.",
-            ]
-        # Deduplicate
-        seen = set(); uniq = []
-        for s in sents:
-            k = s.lower()
-            if k not in seen:
-                seen.add(k); uniq.append(s)
-        random.shuffle(uniq)
+        # Candidate sentences and their term index come from the shared analysis of the text
+        index = get_distractor_index(t)
+        fallback = [
+            "This document discusses key concepts and definitions.",
+            "It presents examples and main ideas.",
+            "It concludes with important takeaways.",
+            "It introduces important terminology and context.",
+        ]
+        # Sample answer positions from a range: no copy of the sentence pool
+        order = random.sample(range(len(index)), min(max(1, n), len(index)))
         out = []
         for i in range(max(1, n)):
-            correct = uniq[i % len(uniq)]
-            pool = [x for x in uniq if x != correct]
-            random.shuffle(pool)
-            distractors = (pool[:3] if len(pool) >= 3 else (pool + ["None of the above", "All of the above", "Not specified"]))[:3]
+            if order:
+                pos = order[i % len(order)]
+                correct = index.sentences[pos]
+                # Similar-looking sentences from elsewhere in the document make plausible distractors
+                distractors = index.distractors(pos, 3)
+            else:
+                correct = fallback[i % len(fallback)]
+                distractors = [x for x in fallback if x != correct]
+            distractors = (distractors + ["None of the above", "All of the above", "Not specified"])[:3]
             options = [correct] + distractors
             random.shuffle(options)
             correct_index = options.index(correct)
@@ -135,44 +354,35 @@ def generate_quiz_from_text_langchain(text: str, num_questions: int = 6) -> List
 
     llm = _load_chat_model()
     if llm is None:
-        return _simple_mcq_from_text(text, num_questions)
+        return _simple_mcq_from_text(text, num_questions), "offline"
     try:
-        from langchain.prompts import ChatPromptTemplate
-        tmpl = ChatPromptTemplate.from_messages([
-            ("system", "You generate quizzes as valid JSON. No extra commentary."),
-            ("system", "Return a JSON array of objects with: question (string), options (array of 4 strings), correct_index (0-3)."),
-            ("system", "Ensure options are plausible and distinct. Focus on key concepts from the text."),
-            ("human", "Create {n} multiple-choice questions from this text.\nTEXT:\n{doc}")
-        ])
-        prompt = tmpl.format_messages(n=num_questions, doc=text[:12000])
-        resp = llm.invoke(prompt)
-        raw = resp.content.strip()
-        # Try direct parse, then attempt to repair by extracting JSON array
-        try:
-            data = json.loads(raw)
-        except Exception:
-            import re
-            m = re.search(r"\[.*\]", raw, re.S)
-            if not m:
-                raise ValueError("No JSON array found in LLM output")
-            data = json.loads(m.group(0))
+        # Sections of the whole document are sent concurrently instead of only its first pages
+        data = _llm_quiz_fanout(llm, text, num_questions)
         out = []
-        for i, q in enumerate(data):
+        seen = set()
+        for q in data:
+            key = " ".join(str(q.get("question", "")).lower().split())
+            if not key or key in seen:
+                continue
+            seen.add(key)
             out.append({
-                "id": i+1,
+                "id": len(out)+1,
                 "question": q.get("question", ""),
                 "options": q.get("options", []),
                 "correct_answer": q.get("correct_index", 0),
                 "type": "multiple_choice",
             })
+        out = out[:num_questions]
+        provider = "openai"
         # If fewer than requested, pad with simple ones
         if len(out) < num_questions:
             extra = _simple_mcq_from_text(text, num_questions - len(out))
             # Fix IDs to be continuous
             for j, q in enumerate(extra, start=len(out)+1):
                 q["id"] = j
+            provider = "mixed" if out else "offline"
             out.extend(extra)
-        return out
+        return out, provider
     except Exception:
         # Fallback to non-LLM MCQ generator using the actual text so it stays relevant
-        return _simple_mcq_from_text(text, num_questions)
+        return _simple_mcq_from_text(text, num_questions), "offline"
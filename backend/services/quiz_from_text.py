@@ -1,26 +1,27 @@
 import re
 from typing import List, Dict
 
+from backend.services.text_analysis import get_analysis
+
+_KEYWORD_RE = re.compile(r"[a-z]{4,}")
+
 def split_sentences(text: str) -> List[str]:
     if not text:
         return []
-    text = re.sub(r"\s+", " ", text)
-    # naive sentence split
-    parts = re.split(r"(?<=[.!?])\s+", text)
-    return [p.strip() for p in parts if p and len(p.strip()) > 20]
+    # Boundaries come from the shared, cached analysis of the text
+    return [s for s in get_analysis(text).sentences() if len(s) > 20]
 
 def extract_keywords(text: str, limit: int = 8) -> List[str]:
-    words = re.findall(r"[A-Za-z][A-Za-z\-]{3,}", text)
     stop = set([
         'this','that','with','from','have','which','their','about','your','into','will','they','were','been','also','some','more','such','than','most','many','like','when','what','where','how','why','then','them','these','those','over','under','between','using','based','within','without','through','only','other','very','each','much','make','made','after','before','because','while','there','here','into','onto','across','upon','even'
     ])
-    freq = {}
-    for w in words:
-        lw = w.lower()
-        if lw in stop:
-            continue
-        freq[lw] = freq.get(lw, 0) + 1
-    ranked = sorted(freq.items(), key=lambda x: x[1], reverse=True)
+    # Term frequencies are precomputed by the analysis; keep alphabetic words of 4+ letters
+    analysis = get_analysis(text)
+    ranked = sorted(
+        ((w, analysis.term_freq[i]) for i, w in enumerate(analysis.vocab) if _KEYWORD_RE.fullmatch(w) and w not in stop),
+        key=lambda x: x[1],
+        reverse=True,
+    )
     return [w for w,_ in ranked[:limit]]
 
 def build_multiple_choice(question_text: str, correct: str) -> Dict:
@@ -0,0 +1,73 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from backend.models.quiz_model import find_generated_quiz, save_generated_quiz
+
+# Generated quizzes live in the quizzes/questions tables; correct answers are stored as A-D
+_LETTERS = "ABCD"
+_counters = {"hits": 0, "misses": 0, "stored": 0, "db_errors": 0}
+_counters_lock = threading.Lock()
+
+
+def _bump(key: str) -> None:
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def _to_row(q: Dict) -> tuple:
+    options = list(q.get("options") or [])[:4]
+    options += [None] * (4 - len(options))
+    idx = q.get("correct_answer")
+    letter = _LETTERS[idx] if isinstance(idx, int) and 0 <= idx < len(_LETTERS) else None
+    return (q.get("question", ""), *options, letter)
+
+
+def _from_row(i: int, row: Dict) -> Dict:
+    options = [row[k] for k in ("option_a", "option_b", "option_c", "option_d") if row.get(k) is not None]
+    letter = (row.get("correct_answer") or "").strip().upper()
+    return {
+        "id": i,
+        "question": row.get("question_text", ""),
+        "options": options,
+        "correct_answer": _LETTERS.index(letter) if letter and letter in _LETTERS else None,
+        "type": "multiple_choice" if options else "open_ended",
+    }
+
+
+def lookup_quiz(content_hash: str, num_questions: int, provider: str,
+                document_id=None) -> Optional[Tuple[Optional[int], List[Dict]]]:
+    """(quiz_id, questions) of a stored quiz for this content and settings, or None.
+    quiz_id is None when the questions come from another document's quiz: the caller
+    should store them as its own quiz rather than hand out someone else's quiz id.
+    """
+    try:
+        found = find_generated_quiz(content_hash, num_questions, provider, document_id)
+    except Exception:
+        _bump("db_errors")
+        return None
+    if not found or not found["questions"]:
+        _bump("misses")
+        return None
+    _bump("hits")
+    questions = [_from_row(i, row) for i, row in enumerate(found["questions"], start=1)]
+    owned = document_id is not None and str(found["document_id"]) == str(document_id)
+    return (found["quiz_id"] if owned else None), questions
+
+
+def store_quiz(document_id, title: str, content_hash: str, num_questions: int, provider: str,
+               questions: List[Dict]) -> Optional[int]:
+    """Persist a generated quiz (one transaction, batched question insert). Returns the quiz id."""
+    try:
+        quiz_id = save_generated_quiz(document_id, title, content_hash, num_questions, provider,
+                                      [_to_row(q) for q in questions])
+    except Exception as e:
+        print("⚠️ Failed to store quiz:", e)
+        _bump("db_errors")
+        return None
+    _bump("stored")
+    return quiz_id
+
+
+def get_quiz_store_stats() -> dict:
+    with _counters_lock:
+        return dict(_counters)
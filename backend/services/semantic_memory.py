@@ -1,13 +1,27 @@
 import os
 import json
-from typing import List, Tuple, Optional
+import threading
+from typing import Dict, List, Tuple, Optional
+
+from backend.services.chunk_store import ChunkStore
+from backend.services.content_store import get_embeddings, put_embeddings
+from backend.utils.digest import text_digest
+from backend.utils.lru_cache import LRUCache
 
 INDEX_DIR = os.path.join("uploads", "indexes")
 os.makedirs(INDEX_DIR, exist_ok=True)
+# Small, fast model; you can switch via env SENTENCE_MODEL
+SENTENCE_MODEL = os.getenv("SENTENCE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Recently seen query embeddings, keyed by normalized query text
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
 
 _model = None
 _index_cache = {}
 _meta_cache = {}
+_store_cache = {}
+_query_cache = LRUCache(max_entries=QUERY_CACHE_SIZE)
+_user_locks = {}
+_locks_guard = threading.Lock()
 
 
 def _embedder():
@@ -15,20 +29,65 @@ def _embedder():
     if _model is None:
         try:
             from sentence_transformers import SentenceTransformer
-            # Small, fast model; you can switch via env SENTENCE_MODEL
-            model_name = os.getenv("SENTENCE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-            _model = SentenceTransformer(model_name)
+            _model = SentenceTransformer(SENTENCE_MODEL)
         except Exception:
             return None
     return _model
 
 
+def warm_up() -> bool:
+    """Load the embedding model and run one encode so the first real query doesn't pay for it."""
+    emb = _embedder()
+    if emb is None:
+        return False
+    try:
+        _encode_query("warm up")
+    except Exception:
+        return False
+    return True
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def _encode_query(query: str):
+    """Embedding of a query as a (1, dim) float32 array, served from the LRU when possible."""
+    import numpy as np  # type: ignore
+    key = _normalize_query(query)
+    vec = _query_cache.get(key)
+    if vec is None:
+        vec = _embedder().encode([key], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+        _query_cache.set(key, vec)
+    return vec
+
+
+def get_query_cache_stats() -> dict:
+    return {"model_loaded": _model is not None, "query_embeddings": _query_cache.stats()}
+
+
 def _index_paths(user_id: int) -> Tuple[str, str]:
     faiss_path = os.path.join(INDEX_DIR, f"user_{user_id}.faiss")
     meta_path = os.path.join(INDEX_DIR, f"user_{user_id}.meta.json")
     return faiss_path, meta_path
 
 
+def _chunk_store(user_id: int) -> ChunkStore:
+    store = _store_cache.get(user_id)
+    if store is None:
+        # One instance per user: a second copy would keep offsets that go stale on the next write
+        with _locks_guard:
+            store = _store_cache.get(user_id)
+            if store is None:
+                store = _store_cache[user_id] = ChunkStore(os.path.join(INDEX_DIR, f"user_{user_id}"))
+    return store
+
+
+def _is_legacy(index, meta: dict, user_id: int) -> bool:
+    """Indexes written before per-document tracking / the chunk store cannot be updated in place."""
+    return "documents" not in meta or len(_chunk_store(user_id)) != index.ntotal
+
+
 def _load_index(user_id: int):
     try:
         import faiss  # type: ignore
@@ -77,61 +136,144 @@ def _split_text(text: str, chunk_size: int = 600, overlap: int = 80) -> List[str
     return [c.strip() for c in chunks if c.strip()]
 
 
-def build_or_update_user_index(user_id: int, fetch_document_callable) -> int:
+def _user_lock(user_id: int) -> threading.Lock:
+    with _locks_guard:
+        lock = _user_locks.get(user_id)
+        if lock is None:
+            lock = _user_locks[user_id] = threading.Lock()
+        return lock
+
+
+def _new_index():
+    import faiss  # type: ignore
+    emb = _embedder()
+    return faiss.IndexFlatIP(emb.get_sentence_embedding_dimension())
+
+
+def _drop_document(user_id: int, index, meta: dict, document_id: int) -> int:
+    """Remove a document's vectors, chunk texts and chunk entries. Returns number of chunks removed."""
+    import numpy as np  # type: ignore
+    positions = [i for i, c in enumerate(meta["chunks"]) if c["document_id"] == document_id]
+    if positions:
+        # IndexFlat compacts on removal, so positions stay aligned with meta["chunks"]
+        index.remove_ids(np.array(positions, dtype=np.int64))
+        _chunk_store(user_id).remove(positions)
+        dropped = set(positions)
+        meta["chunks"] = [c for i, c in enumerate(meta["chunks"]) if i not in dropped]
+    meta["documents"].pop(str(document_id), None)
+    return len(positions)
+
+
+def _add_document(user_id: int, index, meta: dict, document_id: int, filename: Optional[str], content: str, content_hash: str) -> int:
+    """Embed one document's chunks and append them to the index and chunk store. Returns number of chunks added.
+    Embeddings are shared through the content store, so identical text is only ever encoded once.
     """
-    Build or update FAISS index for user's documents.
-    fetch_document_callable: function (doc_id: int, user_id: int) -> dict with 'content'
+    import numpy as np  # type: ignore
+    chunks = _split_text(content)
+    if chunks:
+        vecs = get_embeddings(content_hash, SENTENCE_MODEL)
+        if vecs is None or vecs.shape[0] != len(chunks):
+            vecs = _embedder().encode(chunks, convert_to_numpy=True, normalize_embeddings=True)
+            put_embeddings(content_hash, SENTENCE_MODEL, vecs.astype(np.float32))
+        index.add(vecs.astype(np.float32))
+        _chunk_store(user_id).append(chunks)
+        for _ in chunks:
+            meta["chunks"].append({"document_id": document_id, "filename": filename})
+    meta["documents"][str(document_id)] = {"hash": content_hash, "filename": filename, "chunks": len(chunks)}
+    return len(chunks)
+
+
+def index_document(user_id: int, document_id: int, content: str, filename: Optional[str] = None,
+                   content_hash: Optional[str] = None) -> int:
+    """
+    Incrementally add a single document to the user's FAISS index.
+    Only this document's chunks are embedded. A document already indexed with the
+    same content hash is skipped; one whose content changed is replaced.
     Returns number of chunks indexed.
     """
     try:
-        import faiss  # type: ignore
+        import faiss  # type: ignore  # noqa: F401
     except Exception:
         return 0
-
-    # Fetch user documents
-    from backend.models.document_model import get_user_documents
-    docs = get_user_documents(user_id)
-
-    texts = []
-    sources = []
-    for d in docs:
-        try:
-            full = fetch_document_callable(d["id"], user_id)
-            content = (full or {}).get("content") or ""
-            for ch in _split_text(content):
-                texts.append(ch)
-                sources.append({"document_id": d["id"], "filename": d.get("filename")})
-        except Exception:
-            continue
-
-    if not texts:
+    if _embedder() is None:
         return 0
 
-    emb = _embedder()
-    vecs = emb.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-    dim = vecs.shape[1]
+    digest = content_hash or text_digest(content)
+    with _user_lock(user_id):
+        index, meta = _load_index(user_id)
+        legacy = index is not None and _is_legacy(index, meta, user_id)
+        if not legacy:
+            if index is None:
+                index, meta = _new_index(), {"chunks": [], "documents": {}}
+                _chunk_store(user_id).reset()
+            entry = meta["documents"].get(str(document_id))
+            if entry and entry.get("hash") == digest:
+                return 0
+            if entry:
+                _drop_document(user_id, index, meta, document_id)
+            added = _add_document(user_id, index, meta, document_id, filename, content, digest)
+            _save_index(user_id, index, meta)
+            return added
 
-    index, meta = _load_index(user_id)
-    if index is None:
-        index = faiss.IndexFlatIP(dim)
-        meta = {"chunks": []}
+    # Legacy index without per-document tracking: we cannot tell what is in it, so rebuild once
+    return build_or_update_user_index(user_id, full_rebuild=True)
 
-    # Add vectors
+
+def build_or_update_user_index(user_id: int, fetch_document_callable=None, full_rebuild: bool = False) -> int:
+    """
+    Bring the user's FAISS index in line with their documents.
+    fetch_document_callable: function (doc_id: int, user_id: int) -> dict with 'content'
+    (defaults to document_model.get_document_by_id).
+    By default only documents missing from the index are fetched and embedded, and
+    entries for documents that no longer exist are dropped. full_rebuild=True discards
+    the existing index and re-embeds every document (use it to repair an index).
+    Returns number of chunks indexed.
+    """
     try:
-        import numpy as np  # type: ignore
-        index.add(vecs.astype(np.float32))
+        import faiss  # type: ignore  # noqa: F401
     except Exception:
         return 0
-    for s in sources:
-        meta["chunks"].append(s)
+    if _embedder() is None:
+        return 0
+
+    from backend.models.document_model import get_user_documents, get_document_by_id
+    fetch = fetch_document_callable or get_document_by_id
+    docs = get_user_documents(user_id)
 
-    _save_index(user_id, index, meta)
-    return len(texts)
+    with _user_lock(user_id):
+        index, meta = (None, None) if full_rebuild else _load_index(user_id)
+        if index is None or _is_legacy(index, meta, user_id):
+            index, meta = _new_index(), {"chunks": [], "documents": {}}
+            _chunk_store(user_id).reset()
 
+        live = {d["id"] for d in docs}
+        for key in list(meta["documents"]):
+            if int(key) not in live:
+                _drop_document(user_id, index, meta, int(key))
 
-def retrieve_context(user_id: int, query: str, k: int = 5) -> List[str]:
+        added = 0
+        for d in docs:
+            if str(d["id"]) in meta["documents"]:
+                continue
+            try:
+                full = fetch(d["id"], user_id)
+                content = (full or {}).get("content") or ""
+                added += _add_document(user_id, index, meta, d["id"], d.get("filename"), content, text_digest(content))
+            except Exception:
+                continue
+
+        _save_index(user_id, index, meta)
+        return added
+
+
+def search_chunks(user_id: int, query: str, k: int = 5) -> List[Dict]:
+    """
+    Return the user's top-k chunks for a query as dicts with
+    'text', 'score', 'document_id' and 'filename'.
+    Chunk texts come from the on-disk chunk store, so no database access is needed.
+    """
     try:
-        import faiss  # type: ignore
+        import faiss  # type: ignore  # noqa: F401
     except Exception:
         return []
     index, meta = _load_index(user_id)
@@ -140,27 +282,64 @@ def retrieve_context(user_id: int, query: str, k: int = 5) -> List[str]:
     emb = _embedder()
     if emb is None:
         return []
+    if _is_legacy(index, meta, user_id):
+        # Written before the chunk store existed: its hits have no text, so rebuild it once
+        try:
+            build_or_update_user_index(user_id)
+        except Exception:
+            return _legacy_hits(user_id, query, index, meta, k)
+        index, meta = _load_index(user_id)
+        if index is None:
+            return []
     try:
-        import numpy as np  # type: ignore
-        q = emb.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+        q = _encode_query(query)
     except Exception:
         return []
     D, I = index.search(q, k)
-    # This simple implementation does not store chunk texts, only metadata; we will return placeholders.
-    # For better quality, you can also persist chunk texts. Here we re-hydrate by fetching documents and slicing again.
-    contexts: List[str] = []
+    store = _chunk_store(user_id)
+    chunks = meta.get("chunks", [])
+    hits: List[Dict] = []
+    for score, idx in zip(D[0], I[0]):
+        if idx < 0 or idx >= len(chunks) or idx >= len(store):
+            continue
+        text = store.get(int(idx))
+        if not text:
+            continue
+        hits.append({
+            "text": text,
+            "score": float(score),
+            "document_id": chunks[idx]["document_id"],
+            "filename": chunks[idx].get("filename"),
+        })
+    return hits
+
+
+def _legacy_hits(user_id: int, query: str, index, meta: dict, k: int) -> List[Dict]:
+    """Fallback for an index that could not be rebuilt: the leading text of each hit's document."""
     try:
         from backend.models.document_model import get_document_by_id
-        for idx in I[0]:
-            if idx < 0 or idx >= len(meta.get("chunks", [])):
+        D, I = index.search(_encode_query(query), k)
+        chunks = meta.get("chunks", [])
+        hits: List[Dict] = []
+        seen = set()
+        for score, idx in zip(D[0], I[0]):
+            if idx < 0 or idx >= len(chunks) or chunks[idx]["document_id"] in seen:
                 continue
-            doc_id = meta["chunks"][idx]["document_id"]
+            doc_id = chunks[idx]["document_id"]
+            seen.add(doc_id)
             doc = get_document_by_id(doc_id, user_id)
-            if not doc:
-                continue
-            content = (doc.get("content") or "")
+            content = (doc or {}).get("content") or ""
             if content:
-                contexts.append(content[:1000])
+                hits.append({
+                    "text": content[:1000],
+                    "score": float(score),
+                    "document_id": doc_id,
+                    "filename": chunks[idx].get("filename"),
+                })
+        return hits
     except Exception:
-        pass
-    return contexts[:k]
+        return []
+
+
+def retrieve_context(user_id: int, query: str, k: int = 5) -> List[str]:
+    return [h["text"] for h in search_chunks(user_id, query, k)]
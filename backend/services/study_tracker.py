@@ -0,0 +1,246 @@
+import os
+import time
+import atexit
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from backend.models.study_model import (
+    MAX_GAP_SECONDS, get_active_session, get_totals, ensure_session, add_session_seconds, get_daily_seconds,
+)
+
+# Heartbeats are accumulated in memory; deltas reach study_sessions in batches.
+# Each process keeps its own state; flushes credit a session at most the wall time since
+# its stored last_seen, so several workers tracking one session do not add it up twice.
+FLUSH_SECONDS = float(os.getenv("STUDY_FLUSH_SECONDS", "15"))
+# Users with nothing pending are forgotten after this long without a heartbeat
+IDLE_EVICT_SECONDS = int(os.getenv("STUDY_IDLE_EVICT_SECONDS", "1800"))
+
+_users: Dict[int, dict] = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flusher = None
+_stats = {"heartbeats": 0, "loads": 0, "flushes": 0, "rows_written": 0, "errors": 0}
+
+
+def _gap(now: datetime, last_seen: Optional[datetime]) -> int:
+    if last_seen is None:
+        return 0
+    return max(0, min(int((now - last_seen).total_seconds()), MAX_GAP_SECONDS))
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="study-flush", daemon=True)
+                _flusher.start()
+                atexit.register(flush)
+
+
+def _load(user_id: int, now: datetime) -> dict:
+    """Baseline for a user: their active session and the totals already stored."""
+    active = get_active_session(user_id)
+    with _lock:
+        _stats["loads"] += 1
+    return {
+        "session_id": active[0] if active else None,
+        "start_time": now,
+        "last_seen": active[1] if active else None,
+        # Seconds counted since the last flush, not yet in study_sessions
+        "pending": 0,
+        # (seconds, last_seen) still unflushed from earlier days; already in totals
+        "carry": [],
+        "day": now.date(),
+        "totals": get_totals(user_id, now),
+        "touched": time.time(),
+    }
+
+
+def _state(user_id: int, now: datetime) -> dict:
+    with _lock:
+        state = _users.get(user_id)
+    if state is not None and state["day"] == now.date():
+        return state
+    # New user or new day: re-read the stored totals for the current periods
+    loaded = _load(user_id, now)
+    with _lock:
+        state = _users.get(user_id)
+        if state is None or state["day"] != now.date():
+            if state is not None:
+                # Only this user rolls over: unflushed seconds keep their own day and are
+                # written by the flusher; until then they count towards the periods they fall in
+                loaded["session_id"] = state["session_id"] or loaded["session_id"]
+                loaded["start_time"] = state["start_time"]
+                loaded["last_seen"] = state["last_seen"]
+                loaded["carry"] = state["carry"] + ([(state["pending"], state["last_seen"])] if state["pending"] else [])
+                for seconds, last_seen in loaded["carry"]:
+                    _adjust_totals(loaded, seconds, last_seen.date())
+            state = _users[user_id] = loaded
+    return state
+
+
+def _snapshot(state: dict, extra: int) -> dict:
+    return {key: value + state["pending"] + extra for key, value in state["totals"].items()}
+
+
+def record_heartbeat(user_id: int, now: Optional[datetime] = None) -> dict:
+    """Count one heartbeat and return the user's stats, without writing to the database
+    (totals are read the first time a user is seen, and on a new day)."""
+    now = now or datetime.utcnow()
+    _ensure_flusher()
+    while True:
+        state = _state(user_id, now)
+        with _lock:
+            # A flush may have evicted or replaced the state since it was looked up
+            if _users.get(user_id) is not state:
+                continue
+            state["pending"] += _gap(now, state["last_seen"])
+            state["last_seen"] = now if state["last_seen"] is None else max(state["last_seen"], now)
+            state["touched"] = time.time()
+            _stats["heartbeats"] += 1
+            return _snapshot(state, 0)
+
+
+def get_live_stats(user_id: int, now: Optional[datetime] = None) -> dict:
+    """Stats including heartbeats not yet flushed and the time since the last one."""
+    now = now or datetime.utcnow()
+    while True:
+        state = _state(user_id, now)
+        with _lock:
+            if _users.get(user_id) is not state:
+                continue
+            return _snapshot(state, _gap(now, state["last_seen"]))
+
+
+def get_daily_history(user_id: int, days: int, now: Optional[datetime] = None) -> List[dict]:
+    """Seconds studied on each of the last days (oldest first), today including unflushed heartbeats."""
+    now = now or datetime.utcnow()
+    today = now.date()
+    since = today - timedelta(days=days - 1)
+    stored = get_daily_seconds(user_id, since)
+    with _lock:
+        state = _users.get(user_id)
+        unflushed = []
+        if state is not None and state["day"] == today:
+            # Pending seconds belong to today; earlier days' leftovers are carried with their own day
+            unflushed = [(seconds, last_seen.date()) for seconds, last_seen in state["carry"]]
+            unflushed.append((state["pending"], today))
+    for seconds, day in unflushed:
+        if day >= since:
+            stored[day] = stored.get(day, 0) + seconds
+    return [{"date": (since + timedelta(days=i)).isoformat(), "seconds": stored.get(since + timedelta(days=i), 0)}
+            for i in range(days)]
+
+
+def _adjust_totals(state: dict, seconds: int, day=None) -> None:
+    """Add seconds to the totals; with day, only to the periods (of state's day) that contain it."""
+    for key in state["totals"]:
+        if day is not None:
+            if key == "today_seconds" and day != state["day"]:
+                continue
+            if key == "week_seconds" and day < state["day"] - timedelta(days=state["day"].weekday()):
+                continue
+        state["totals"][key] += seconds
+
+
+def _move_pending(state: dict, seconds: int) -> None:
+    # Flushed seconds move from pending into the stored baseline (negative seconds undo it)
+    state["pending"] -= seconds
+    _adjust_totals(state, seconds)
+
+
+def _requeue(user_id: int, state: dict, seconds: int, last_seen: datetime) -> None:
+    """Put unwritten seconds back as a carry of the user's current state (caller holds _lock)."""
+    current = _users.setdefault(user_id, state)
+    current["carry"].insert(0, (seconds, last_seen))
+    if current is not state:
+        # The user rolled over during the flush: the new baseline does not count them yet
+        _adjust_totals(current, seconds, last_seen.date())
+
+
+def flush() -> int:
+    """Write pending seconds of every user to study_sessions. Returns the rows written."""
+    with _flush_lock:
+        carries, updates, inserts = [], [], []
+        with _lock:
+            for user_id, state in _users.items():
+                carries.extend((user_id, state, seconds, last_seen) for seconds, last_seen in state["carry"])
+                state["carry"] = []
+                pending = state["pending"]
+                # last_seen is captured with pending so both describe the same stretch
+                if state["session_id"] is None and state["last_seen"] is not None:
+                    inserts.append((user_id, state, pending, state["last_seen"]))
+                elif pending:
+                    updates.append((user_id, state, pending, state["last_seen"]))
+                else:
+                    continue
+                _move_pending(state, pending)
+
+        written = 0
+        try:
+            # Earlier days first, one small transaction per user, so each lands on its own day
+            while carries:
+                user_id, state, seconds, last_seen = carries[0]
+                session_id, got = ensure_session(user_id, state["start_time"], last_seen, seconds)
+                with _lock:
+                    state["session_id"] = state["session_id"] or session_id
+                    _adjust_totals(state, got - seconds, last_seen.date())
+                carries.pop(0)
+                written += 1
+            credited = add_session_seconds([(user_id, last_seen, seconds, state["session_id"])
+                                            for user_id, state, seconds, last_seen in updates])
+            with _lock:
+                for _, state, seconds, _ in updates:
+                    # Another process may already have counted part of this stretch
+                    _adjust_totals(state, credited.get(state["session_id"], 0) - seconds)
+            written += len(updates)
+            updates = []
+            while inserts:
+                user_id, state, seconds, last_seen = inserts[0]
+                session_id, got = ensure_session(user_id, state["start_time"], last_seen, seconds)
+                with _lock:
+                    state["session_id"] = session_id
+                    _adjust_totals(state, got - seconds)
+                inserts.pop(0)
+                written += 1
+        except Exception as e:
+            print("⚠️ Study session flush failed:", e)
+            # Whatever was not written stays pending for the next flush
+            with _lock:
+                for user_id, state, seconds, last_seen in updates + inserts:
+                    if _users.get(user_id) is state:
+                        _move_pending(state, -seconds)
+                    else:
+                        _requeue(user_id, state, seconds, last_seen)
+                for user_id, state, seconds, last_seen in reversed(carries):
+                    _requeue(user_id, state, seconds, last_seen)
+                _stats["errors"] += 1
+
+        cutoff = time.time() - IDLE_EVICT_SECONDS
+        with _lock:
+            for user_id in [u for u, st in _users.items()
+                            if not st["pending"] and not st["carry"] and st["session_id"] is not None
+                            and st["touched"] < cutoff]:
+                del _users[user_id]
+            _stats["flushes"] += 1
+            _stats["rows_written"] += written
+        return written
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception:
+            pass
+
+
+def get_study_tracker_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+        stats["users"] = len(_users)
+        stats["pending_seconds"] = sum(s["pending"] + sum(c for c, _ in s["carry"]) for s in _users.values())
+    return stats
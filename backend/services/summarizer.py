@@ -2,13 +2,46 @@
 from transformers import pipeline
 import re
 import os
+import threading
 from collections import Counter
 
+from backend.services.text_analysis import get_analysis
+
 # Prefer the HF abstractive model unless explicitly disabled
 # Allow explicit model selection via env
 MODEL_NAME = os.getenv("SUMMARIZER_MODEL", "facebook/bart-large-cnn").strip()
 USE_HF = os.getenv("USE_HF_SUMMARIZER", "1") == "1"
+# Number of chunks sent through the model together in the map stage
+BATCH_SIZE = max(1, int(os.getenv("SUMMARIZER_BATCH_SIZE", "4")))
+# Partial summaries are merged in groups of at most this many characters per reduce node
+REDUCE_GROUP_CHARS = max(500, int(os.getenv("SUMMARIZER_REDUCE_CHARS", "2000")))
+# Worker processes for map/reduce nodes; 0 or 1 runs them in-process
+WORKERS = int(os.getenv("SUMMARIZER_WORKERS", "0"))
+# Sentence scoring for the extractive path: 'tfidf' (vectorized), 'textrank' (tfidf + sparse
+# power iteration) or 'classic' (the original per-sentence loop)
+EXTRACTIVE_ENGINE = os.getenv("EXTRACTIVE_ENGINE", "tfidf").strip().lower()
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
 summarizer = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def summary_mode() -> str:
+    """'extractive' when DistilBERT is selected or HF is disabled, else 'abstractive'."""
+    return "extractive" if MODEL_NAME.lower() == "distilbert" or not USE_HF else "abstractive"
+
+
+def summary_variant() -> str:
+    """Cache key component: the mode, plus the sentence scorer when extractive."""
+    mode = summary_mode()
+    return mode if mode == "abstractive" else f"ext:{EXTRACTIVE_ENGINE}"
+
+
+def normalize_length(length) -> str:
+    """The length a request is summarized at: short or medium as asked, anything else long."""
+    return length if length in ("short", "medium") else "long"
+
 
 def _get_summarizer():
     global summarizer
@@ -67,12 +100,102 @@ def _chunk_text(text: str, max_chars: int = 900, overlap_chars: int = 120):
     return chunks if chunks else [text[:max_chars]]
 
 
+def _length_batches(texts):
+    """Group text indices into batches, longest first, so each batch pads to a similar size."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[start:start + BATCH_SIZE] for start in range(0, len(order), BATCH_SIZE)]
+
+
+def _iter_summarize_batches(pipe, texts, **gen_kwargs):
+    """Run the pipeline over many texts in padded batches, yielding (index, summary) as each batch finishes."""
+    for batch in _length_batches(texts):
+        results = pipe([texts[i] for i in batch], batch_size=BATCH_SIZE, **gen_kwargs)
+        for i, res in zip(batch, results):
+            # Some pipeline versions wrap each result in a list
+            if isinstance(res, list):
+                res = res[0]
+            yield i, res["summary_text"]
+
+
+def _pool_worker_init(threads: int):
+    # Split the cores between workers instead of letting every process claim all of them
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    _get_summarizer()
+
+
+def _pool_summarize(texts, gen_kwargs):
+    out = [None] * len(texts)
+    for i, summary_text in _iter_summarize_batches(_get_summarizer(), texts, **gen_kwargs):
+        out[i] = summary_text
+    return out
+
+
+def _get_pool():
+    global _pool
+    if _pool is None and WORKERS > 1 and summary_mode() == "abstractive":
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                threads = max(1, (os.cpu_count() or 1) // WORKERS)
+                _pool = ProcessPoolExecutor(
+                    max_workers=WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_pool_worker_init,
+                    initargs=(threads,),
+                )
+    return _pool
+
+
+def _iter_nodes(texts, **gen_kwargs):
+    """Summarize independent texts, yielding (index, summary) as they finish.
+    Batches are spread over the process pool when SUMMARIZER_WORKERS > 1.
+    """
+    pool = _get_pool()
+    if pool is None:
+        yield from _iter_summarize_batches(_get_summarizer(), texts, **gen_kwargs)
+        return
+    from concurrent.futures import as_completed
+    futures = {pool.submit(_pool_summarize, [texts[i] for i in batch], gen_kwargs): batch for batch in _length_batches(texts)}
+    for fut in as_completed(futures):
+        for i, summary_text in zip(futures[fut], fut.result()):
+            yield i, summary_text
+
+
+def _summarize_nodes(texts, **gen_kwargs):
+    out = [None] * len(texts)
+    for i, summary_text in _iter_nodes(texts, **gen_kwargs):
+        out[i] = _normalize_whitespace(summary_text)
+    return out
+
+
+def _group_for_reduce(parts, max_chars: int):
+    """Split consecutive parts into groups whose joined length stays under max_chars."""
+    groups, current, size = [], [], 0
+    for part in parts:
+        if current and size + len(part) + 1 > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(part)
+        size += len(part) + 1
+    if current:
+        groups.append(current)
+    # Guarantee progress when every part is close to the limit on its own
+    if len(parts) > 1 and len(groups) == len(parts):
+        groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+    return groups
+
+
 def _clean_text(t: str) -> str:
     # Remove common artifacts: bullets, copyright lines, page numbers
     t = re.sub(r"[\u2022\u2023\u25CF\u25A0\u25E6\u2219\u25C6\u25C7\u2666\u25C8\u25AA\u25AB\u25FE\u25FD\u25CB\u274F\u25A1\u25B8\u25B9\u25AA\u25AB\u25BA\u25C4\u25B6\u25B2\u25BC\u2751\u2752\u25CF\u25CB\u25CC\u25D8\u25D9\u2023\u2043\u2219\u204C\u204D\u25E6\u223C\u2794\u27A4\u27A2\u29BF\u2024\u2027\u2219\u25AA\u25AB\u25CF\u25CB\u25C9\u25CE\u25C7\u25C6\u25C8\u25C9\u142F\u25CF\u25A0\u25CF\u25A1\u25A3\u25A4\u25A9\u25A6\u25A7\u25A8\u25A9\u25AA\u25AB\u25AC\u25AD\u25AE\u25AF\u25B0\u25B1\u25B2\u25B3\u25B4\u25B5\u25B6\u25B7\u25B8\u25B9\u25BA\u25BB\u25BC\u25BD\u25BE\u25BF\u25C0\u25C1\u25C2\u25C3]", " ", t)
     t = t.replace('❑', ' ').replace('▪', ' ').replace('©', ' ')
     # Remove copyright/footer like "2022 UBT 10"
-    t = re.sub(r"\b\d{4}\b\s+UBT\b.*", " ", t, flags=re.IGNORECASE)
+    t = re.sub(r"\b\d{4}\b[ \t]+UBT\b[^\n]*", " ", t, flags=re.IGNORECASE)
     # Remove standalone page numbers
     t = re.sub(r"\b\d+\b", lambda m: " " if len(m.group()) <= 3 else m.group(), t)
     # Collapse multiple spaces
@@ -80,59 +203,192 @@ def _clean_text(t: str) -> str:
     return t.strip()
 
 
-def _extractive_summary(text: str, target_sentences: int) -> str:
-    text = _clean_text(text)
-    # Split to sentences
-    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if s.strip()]
+# English + Albanian common stopwords
+_STOPWORDS = set([
+    # English
+    'the','is','in','at','of','a','and','to','for','on','with','as','by','an','be','are','it','that','this','from','or','was','were','have','has','had','you','we','they','he','she','i','your','our','their','not','but','if','then','so','also','can','will','may','might',
+    # Albanian (basic subset)
+    'dhe','një','është','në','me','si','të','për','ose','nga','kjo','ky','ajo','ai','ajo','janë','jemi','jam','ke','kam','ishte','ishin','do','mund','është','edhe','pasi','kur','që','ne','ju','ata','atyre','i','e','te','ti','ka','kaq','këtë','atë','këto','ato'
+])
+
+
+def _term_id_sets(analysis):
+    """(stopword ids, short-number ids) for a text, memoized on its analysis.
+    Short numbers are the page numbers _clean_text strips, so they never count as words.
+    """
+    sets = analysis.memo.get("summary_terms")
+    if sets is None:
+        stop = {i for i, w in enumerate(analysis.vocab) if w in _STOPWORDS}
+        numbers = {i for i, w in enumerate(analysis.vocab) if w.isdigit() and len(w) <= 3}
+        sets = analysis.memo["summary_terms"] = (stop, numbers)
+    return sets
+
+
+def _candidate_sentences(analysis):
+    """(cleaned sentence, sentence id) pairs worth ranking, filtered and de-duplicated.
+    Memoized on the analysis: cleaning every sentence costs more than scoring them.
+    """
+    cached = analysis.memo.get("summary_candidates")
+    if cached is not None:
+        return cached
+    sentences = []
+    for sid in range(analysis.sentence_count):
+        # Clean the sentence as it appears in the text, before its line breaks are collapsed
+        s = _clean_text(analysis.raw_sentence(sid))
+        if s:
+            sentences.append((s, sid))
     # Filter noisy/too short/too long sentences
     filtered = []
-    for s in sentences:
+    for s, sid in sentences:
         wc = len(s.split())
         if 8 <= wc <= 40 and re.search(r"[A-Za-zÀ-ÿ]", s):
-            filtered.append(s)
+            filtered.append((s, sid))
     if not filtered:
         filtered = sentences[:]
     # Deduplicate preserving order
     seen = set()
     dedup = []
-    for s in filtered:
+    for s, sid in filtered:
         key = s.lower()
         if key not in seen:
             seen.add(key)
-            dedup.append(s)
-    if len(dedup) <= target_sentences:
-        return _normalize_whitespace(" ".join(dedup))
-
-    # Build frequency table with English + Albanian common stopwords
-    words = re.findall(r"[a-zA-ZÀ-ÿ0-9']+", " ".join(dedup).lower())
-    stop = set([
-        # English
-        'the','is','in','at','of','a','and','to','for','on','with','as','by','an','be','are','it','that','this','from','or','was','were','have','has','had','you','we','they','he','she','i','your','our','their','not','but','if','then','so','also','can','will','may','might',
-        # Albanian (basic subset)
-        'dhe','një','është','në','me','si','të','për','ose','nga','kjo','ky','ajo','ai','ajo','janë','jemi','jam','ke','kam','ishte','ishin','do','mund','është','edhe','pasi','kur','që','ne','ju','ata','atyre','i','e','te','ti','ka','kaq','këtë','atë','këto','ato'
-    ])
-    freq = Counter(w for w in words if w not in stop)
+            dedup.append((s, sid))
+    analysis.memo["summary_candidates"] = dedup
+    return dedup
+
+
+def _classic_scores(analysis, dedup):
+    # Build frequency table over the candidate sentences, ignoring stopwords
+    stop, numbers = _term_id_sets(analysis)
+    words = {sid: [t for t in analysis.sentence_token_ids(sid) if t not in numbers] for _, sid in dedup}
+    freq = Counter(t for ws in words.values() for t in ws if t not in stop)
 
     scores = []
-    for i, s in enumerate(dedup):
-        ws = re.findall(r"[a-zA-ZÀ-ÿ0-9']+", s.lower())
+    for i, (s, sid) in enumerate(dedup):
+        ws = words[sid]
         score = sum(freq.get(w, 0) for w in ws) / (len(ws) + 1e-6)
         # Small boost for early sentences
         score += 0.05 * (1.0 / (i + 1))
-        scores.append((score, i, s))
+        scores.append(score)
+    return scores
 
-    top = sorted(scores, key=lambda x: (-x[0], x[1]))[:target_sentences]
-    top_sorted = [s for _, _, s in sorted(top, key=lambda x: x[1])]
-    return _normalize_whitespace(" ".join(top_sorted))
 
+def _sentence_term_matrix(analysis, dedup, np):
+    """COO triplets (row, term, count) of the candidate sentences, plus each row's word count.
+    Built straight from the analysis arrays: no per-sentence Python loop over tokens.
+    """
+    stop, numbers = _term_id_sets(analysis)
+    token_ids = np.frombuffer(analysis.token_ids, dtype=np.intc).astype(np.int64)
+    offsets = np.frombuffer(analysis.token_offsets, dtype=np.intc)
+    sids = np.fromiter((sid for _, sid in dedup), dtype=np.int64, count=len(dedup))
+    starts, ends = offsets[sids], offsets[sids + 1]
+    lengths = ends - starts
+    # Token positions of every candidate sentence, concatenated, with their row number
+    rows = np.repeat(np.arange(len(sids)), lengths)
+    pos = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+    terms = token_ids[pos]
 
-def generate_summary(text, length="medium"):
+    vocab_size = len(analysis.vocab)
+    is_number = np.zeros(vocab_size, dtype=bool)
+    is_number[list(numbers)] = True
+    keep = ~is_number[terms]
+    rows, terms = rows[keep], terms[keep]
+    word_counts = np.bincount(rows, minlength=len(sids))
+
+    is_stop = np.zeros(vocab_size, dtype=bool)
+    is_stop[list(stop)] = True
+    keep = ~is_stop[terms]
+    cells, counts = np.unique(rows[keep] * vocab_size + terms[keep], return_counts=True)
+    return cells // vocab_size, cells % vocab_size, counts.astype(np.float64), word_counts
+
+
+def _vector_scores(analysis, dedup, np):
+    n = len(dedup)
+    rows, terms, counts, word_counts = _sentence_term_matrix(analysis, dedup, np)
+    vocab_size = len(analysis.vocab)
+    tf = np.bincount(terms, weights=counts, minlength=vocab_size)
+    df = np.bincount(terms, minlength=vocab_size)
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    weights = counts * idf[terms]
+
+    # Sentence score: its words' document frequency, idf-weighted, normalised by length
+    scores = np.bincount(rows, weights=weights * tf[terms], minlength=n) / (word_counts + 1e-6)
+    scores = scores / (scores.max() or 1.0)
+
+    if EXTRACTIVE_ENGINE == "textrank":
+        ranks = _textrank(rows, terms, weights, n, vocab_size, np)
+        if ranks is not None:
+            scores = 0.5 * scores + 0.5 * ranks / (ranks.max() or 1.0)
+
+    # Small boost for early sentences
+    return scores + 0.05 / np.arange(1, n + 1)
+
+
+def _textrank(rows, terms, weights, n, vocab_size, np):
+    """Power iteration over the cosine-similarity graph of the sentences' tfidf vectors."""
+    try:
+        from scipy import sparse
+    except ImportError:
+        return None
+    X = sparse.csr_matrix((weights, (rows, terms)), shape=(n, vocab_size))
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    X = sparse.diags(1.0 / np.where(norms > 0, norms, 1.0)) @ X
+    S = (X @ X.T).tocsr()
+    S.setdiag(0)
+    S.eliminate_zeros()
+    out_degree = np.asarray(S.sum(axis=1)).ravel()
+    # Column-stochastic transition matrix; sentences with no neighbours spread evenly
+    M = (sparse.diags(1.0 / np.where(out_degree > 0, out_degree, 1.0)) @ S).T.tocsr()
+    dangling = out_degree == 0
+    r = np.full(n, 1.0 / n)
+    for _ in range(TEXTRANK_ITERATIONS):
+        nxt = (1 - TEXTRANK_DAMPING) / n + TEXTRANK_DAMPING * (M @ r + r[dangling].sum() / n)
+        if np.abs(nxt - r).sum() < 1e-6:
+            r = nxt
+            break
+        r = nxt
+    return r
+
+
+def _extractive_summary(text: str, target_sentences: int) -> str:
+    # Sentence boundaries and tokens come from the shared, cached analysis of the source text
+    analysis = get_analysis(text)
+    dedup = _candidate_sentences(analysis)
+    if len(dedup) <= target_sentences:
+        return _normalize_whitespace(" ".join(s for s, _ in dedup))
+
+    np = None
+    if EXTRACTIVE_ENGINE != "classic":
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    if np is None:
+        scores = _classic_scores(analysis, dedup)
+        top = sorted(range(len(dedup)), key=lambda i: (-scores[i], i))[:target_sentences]
+    else:
+        scores = _vector_scores(analysis, dedup, np)
+        top = np.argpartition(-scores, target_sentences - 1)[:target_sentences].tolist()
+
+    return _normalize_whitespace(" ".join(dedup[i][0] for i in sorted(top)))
+
+
+def iter_summary(text, length="medium"):
+    """Summarize text, yielding progress events as they are produced.
+
+    Multi-chunk documents yield {"type": "partial", "index", "total", "summary"} for
+    each chunk as its batch finishes; every run ends with {"type": "final", "summary"}.
+    """
     if not text or text.strip() == "":
-        return "No text available for summarization."
+        yield {"type": "final", "summary": "No text available for summarization."}
+        return
 
+    # The extractive path reads the cached analysis of the original text and cleans per sentence
+    source = text
     # Clean source text first to improve model quality
     text = _clean_text(text)
 
+    length = normalize_length(length)
     # Adjust target lengths (a bit longer for better coherence)
     if length == "short":
         max_len = 90
@@ -143,52 +399,45 @@ def generate_summary(text, length="medium"):
     else:
         max_len = 260
         min_len = 100
+    target = 3 if length == "short" else (5 if length == "medium" else 8)
 
     # If DistilBERT is selected or HF disabled, use extractive summarization
-    if MODEL_NAME.lower() == "distilbert" or not USE_HF:
-        target = 3 if length == "short" else (5 if length == "medium" else 8)
-        return _extractive_summary(text, target)
+    if summary_mode() == "extractive":
+        yield {"type": "final", "summary": _extractive_summary(source, target)}
+        return
 
     chunks = _chunk_text(text, max_chars=900, overlap_chars=120)
+    node_kwargs = dict(max_length=min(max_len, 220), min_length=min_len, do_sample=False, num_beams=4, truncation=True)
+    final_kwargs = dict(max_length=max_len, min_length=min_len, do_sample=False, num_beams=4, truncation=True)
     try:
-        pipe = _get_summarizer()
-        if pipe is None:
+        if _get_pool() is None and _get_summarizer() is None:
             # Safety net: if pipeline couldn't initialize, fall back to extractive
-            target = 3 if length == "short" else (5 if length == "medium" else 8)
-            return _extractive_summary(text, target)
+            yield {"type": "final", "summary": _extractive_summary(source, target)}
+            return
         if len(chunks) == 1:
-            result = pipe(
-                chunks[0],
-                max_length=max_len,
-                min_length=min_len,
-                do_sample=False,
-                num_beams=4,
-                truncation=True,
-            )
-            return _normalize_whitespace(result[0]["summary_text"])
-
-        partial_summaries = []
-        for ch in chunks:
-            res = pipe(
-                ch,
-                max_length=min(max_len, 220),
-                min_length=min_len,
-                do_sample=False,
-                num_beams=4,
-                truncation=True,
-            )
-            partial_summaries.append(res[0]["summary_text"]) 
-
-        combined = _normalize_whitespace(" ".join(partial_summaries))
-        final = pipe(
-            combined[:2000],
-            max_length=max_len,
-            min_length=min_len,
-            do_sample=False,
-            num_beams=4,
-            truncation=True,
-        )
-        return _normalize_whitespace(final[0]["summary_text"])
+            yield {"type": "final", "summary": _summarize_nodes(chunks, **final_kwargs)[0]}
+            return
+
+        partial_summaries = [None] * len(chunks)
+        for i, summary_text in _iter_nodes(chunks, **node_kwargs):
+            partial_summaries[i] = _normalize_whitespace(summary_text)
+            yield {"type": "partial", "index": i, "total": len(chunks), "summary": partial_summaries[i]}
+
+        # Tree reduce: merge partial summaries in bounded groups, level by level,
+        # until what is left fits one final pass - nothing is truncated away
+        groups = _group_for_reduce(partial_summaries, REDUCE_GROUP_CHARS)
+        while len(groups) > 1:
+            reduced = _summarize_nodes([" ".join(g) for g in groups], **node_kwargs)
+            groups = _group_for_reduce(reduced, REDUCE_GROUP_CHARS)
+        final_summary = _summarize_nodes([" ".join(groups[0])], **final_kwargs)[0]
     except Exception:
-        target = 3 if length == "short" else (5 if length == "medium" else 8)
-        return _extractive_summary(text, target)
+        final_summary = _extractive_summary(source, target)
+    yield {"type": "final", "summary": final_summary}
+
+
+def generate_summary(text, length="medium"):
+    final_summary = None
+    for event in iter_summary(text, length):
+        if event["type"] == "final":
+            final_summary = event["summary"]
+    return final_summary
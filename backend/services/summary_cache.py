@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import Optional
+
+from backend.models.summary_model import get_cached_summary, save_cached_summary, delete_cached_summaries
+from backend.utils.digest import text_digest
+from backend.services.summarizer import MODEL_NAME, normalize_length, summary_variant
+from backend.utils.lru_cache import LRUCache
+
+# Two tiers: an in-process LRU in front of the summary_cache table.
+# Keys are (text hash, length, SUMMARIZER_MODEL, abstractive or extractive scorer).
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+
+_memory = LRUCache(max_entries=SUMMARY_CACHE_SIZE)
+_counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "db_errors": 0}
+_counters_lock = threading.Lock()
+
+
+def _bump(key: str) -> None:
+    with _counters_lock:
+        _counters[key] += 1
+
+
+def _key(text_hash: str, length: str) -> tuple:
+    # Requests summarized the same way share one entry, and the key fits summary_cache.length
+    return (text_hash, normalize_length(length), MODEL_NAME, summary_variant())
+
+
+def lookup_summary(text: str, length: str, text_hash: Optional[str] = None) -> Optional[str]:
+    """Return a cached summary for this text and length, or None.
+    Pass text_hash when the caller already knows the text's sha256.
+    """
+    key = _key(text_hash or text_digest(text), length)
+    summary_text = _memory.get(key)
+    if summary_text is not None:
+        _bump("memory_hits")
+        return summary_text
+    try:
+        summary_text = get_cached_summary(*key)
+    except Exception:
+        _bump("db_errors")
+        summary_text = None
+    if summary_text is None:
+        _bump("misses")
+        return None
+    _bump("db_hits")
+    _memory.set(key, summary_text)
+    return summary_text
+
+
+def store_summary(text: str, length: str, summary_text: str, text_hash: Optional[str] = None) -> None:
+    key = _key(text_hash or text_digest(text), length)
+    _memory.set(key, summary_text)
+    try:
+        save_cached_summary(*key, summary_text)
+    except Exception:
+        _bump("db_errors")
+
+
+def invalidate_summaries(text_hash: str) -> int:
+    """Drop cached summaries of one text hash. Returns DB rows removed."""
+    _memory.remove_if(lambda k: k[0] == text_hash)
+    return delete_cached_summaries(text_hash)
+
+
+def get_summary_cache_stats() -> dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["memory"] = _memory.stats()
+    return stats
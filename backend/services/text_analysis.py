@@ -0,0 +1,195 @@
+import os
+import re
+import sys
+import json
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+from backend.services.content_store import read_artifact, write_artifact
+from backend.utils.digest import text_digest
+from backend.utils.lru_cache import LRUCache
+
+# One sentence splitter and one tokenizer for every consumer (summarizer, quiz, chat).
+# Sentences end at . ! ? followed by whitespace, or at any line break: slide and PDF text
+# often has one unpunctuated line per bullet.
+_SENT_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_TOKEN_RE = re.compile(r"[A-Za-zÀ-ÿ0-9']+")
+
+_ARTIFACT_SUFFIX = ".analysis.bin"
+_FORMAT_VERSION = 2
+
+# Memory budget for cached analyses; one entry holds arrays proportional to its text
+TEXT_ANALYSIS_CACHE_MB = int(os.getenv("TEXT_ANALYSIS_CACHE_MB", "64"))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class TextAnalysis:
+    """Sentence boundaries, token ids and term frequencies of one text, held in flat int arrays.
+
+    spans: [start0, end0, start1, end1, ...] character offsets of each sentence
+    token_offsets: token_ids[token_offsets[i]:token_offsets[i + 1]] are sentence i's tokens
+    token_ids: indexes into vocab
+    term_freq: term_freq[t] is the count of vocab[t] across the whole text
+    """
+
+    def __init__(self, text: str, vocab: List[str], spans: array, token_offsets: array,
+                 token_ids: array, term_freq: array):
+        self.text = text
+        self.vocab = vocab
+        self.spans = spans
+        self.token_offsets = token_offsets
+        self.token_ids = token_ids
+        self.term_freq = term_freq
+        self._term_index: Optional[Dict[str, int]] = None
+        # Per-text memo for values consumers derive from the arrays (stopword id sets, ...)
+        self.memo: dict = {}
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.spans) // 2
+
+    def raw_sentence(self, i: int) -> str:
+        """Sentence i exactly as it appears in the text."""
+        return self.text[self.spans[2 * i]:self.spans[2 * i + 1]]
+
+    def sentence(self, i: int) -> str:
+        """Sentence i with its whitespace collapsed."""
+        return " ".join(self.raw_sentence(i).split())
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this analysis, text included."""
+        arrays = (self.spans, self.token_offsets, self.token_ids, self.term_freq)
+        return (sys.getsizeof(self.text) + sum(a.itemsize * len(a) for a in arrays)
+                + sum(sys.getsizeof(t) for t in self.vocab))
+
+    def sentences(self) -> List[str]:
+        return [self.sentence(i) for i in range(self.sentence_count)]
+
+    def sentence_token_ids(self, i: int) -> array:
+        return self.token_ids[self.token_offsets[i]:self.token_offsets[i + 1]]
+
+    def sentence_length(self, i: int) -> int:
+        return self.token_offsets[i + 1] - self.token_offsets[i]
+
+    def term_id(self, term: str) -> Optional[int]:
+        if self._term_index is None:
+            self._term_index = {t: i for i, t in enumerate(self.vocab)}
+        return self._term_index.get(term)
+
+    def term_ids(self, terms: Iterable[str]) -> Set[int]:
+        ids = set()
+        for term in terms:
+            tid = self.term_id(term)
+            if tid is not None:
+                ids.add(tid)
+        return ids
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            "version": _FORMAT_VERSION,
+            "vocab": self.vocab,
+            "sizes": [len(self.spans), len(self.token_offsets), len(self.token_ids), len(self.term_freq)],
+        }, ensure_ascii=False).encode("utf-8")
+        return b"".join([
+            struct.pack("<I", len(header)), header,
+            self.spans.tobytes(), self.token_offsets.tobytes(), self.token_ids.tobytes(), self.term_freq.tobytes(),
+        ])
+
+    @classmethod
+    def from_bytes(cls, text: str, data: bytes) -> "TextAnalysis":
+        (header_len,) = struct.unpack_from("<I", data, 0)
+        header = json.loads(data[4:4 + header_len].decode("utf-8"))
+        if header.get("version") != _FORMAT_VERSION:
+            raise ValueError("Unsupported analysis format")
+        pos = 4 + header_len
+        arrays = []
+        for size in header["sizes"]:
+            arr = array("i")
+            arr.frombytes(data[pos:pos + size * arr.itemsize])
+            pos += size * arr.itemsize
+            arrays.append(arr)
+        return cls(text, header["vocab"], *arrays)
+
+
+_cache = LRUCache(
+    max_entries=4096,
+    max_bytes=TEXT_ANALYSIS_CACHE_MB * 1024 * 1024,
+    # Memoized per-text values (candidates, distractor index) roughly double the footprint
+    sizeof=lambda analysis: 2 * analysis.nbytes(),
+)
+
+
+def _sentence_spans(text: str):
+    pos = 0
+    for m in _SENT_BOUNDARY_RE.finditer(text):
+        yield pos, m.start()
+        pos = m.end()
+    yield pos, len(text)
+
+
+def analyze(text: str) -> TextAnalysis:
+    """Split and tokenize text from scratch. Prefer get_analysis, which caches the result."""
+    text = text or ""
+    vocab: List[str] = []
+    index: Dict[str, int] = {}
+    spans, token_offsets, token_ids, term_freq = array("i"), array("i", [0]), array("i"), array("i")
+    for start, end in _sentence_spans(text):
+        tokens = _TOKEN_RE.findall(text[start:end].lower())
+        if not tokens:
+            continue
+        # Trim surrounding whitespace from the span
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        spans.extend((start, end))
+        for tok in tokens:
+            tid = index.get(tok)
+            if tid is None:
+                tid = index[tok] = len(vocab)
+                vocab.append(tok)
+                term_freq.append(0)
+            token_ids.append(tid)
+            term_freq[tid] += 1
+        token_offsets.append(len(token_ids))
+    return TextAnalysis(text, vocab, spans, token_offsets, token_ids, term_freq)
+
+
+def get_analysis(text: str, content_hash: Optional[str] = None, persist: Optional[bool] = None) -> TextAnalysis:
+    """
+    Analysis of text from memory, the content store, or computed (and cached) here.
+    content_hash: sha256 of a stored document's text, when known.
+    persist: write the analysis to the content store. Defaults to only when content_hash
+    is given, so texts that arrive in requests never leave files behind. Reads are always
+    by digest, so any caller passing a stored document's text reuses the ingestion artifact.
+    """
+    text = text or ""
+    if persist is None:
+        persist = content_hash is not None
+    digest = content_hash or text_digest(text)
+    analysis = _cache.get(digest)
+    if analysis is not None:
+        return analysis
+    data = read_artifact(digest, _ARTIFACT_SUFFIX)
+    if data is not None:
+        try:
+            analysis = TextAnalysis.from_bytes(text, data)
+        except Exception:
+            analysis = None
+    if analysis is None:
+        analysis = analyze(text)
+        if persist:
+            try:
+                write_artifact(digest, _ARTIFACT_SUFFIX, analysis.to_bytes())
+            except Exception:
+                pass
+    _cache.set(digest, analysis)
+    return analysis
+
+
+def get_text_analysis_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def text_digest(text: str) -> str:
+    """sha256 hex digest of text as UTF-8; the key for content shared across documents and users."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
@@ -1,8 +1,99 @@
 import jwt
+import time
+import hashlib
 import datetime
+import threading
 from functools import wraps
 from flask import request, jsonify
 from backend.config.env_config import Config
+from backend.utils.lru_cache import LRUCache
+from backend.models.token_model import add_revoked_token, get_active_revocations, delete_expired_revocations
+
+# Payloads of tokens that passed signature verification, keyed by sha256 of the token
+# and expiring at the token's own exp, so a client reusing a token skips the HMAC check
+_verified = LRUCache(max_entries=max(1, Config.JWT_CACHE_SIZE))
+# Revoked token digests -> exp; entries are dropped once the token would have expired anyway.
+# The revoked_tokens table is the shared record; each process reloads its copy at most every
+# JWT_REVOCATION_SYNC_SECONDS, so a token revoked by another worker is honoured here within that delay.
+_revoked = {}
+_revoked_lock = threading.Lock()
+_revoked_synced_at = 0.0
+
+
+def _sync_revoked():
+    global _revoked, _revoked_synced_at
+    now = time.time()
+    if now - _revoked_synced_at < Config.JWT_REVOCATION_SYNC_SECONDS:
+        return
+    with _revoked_lock:
+        if now - _revoked_synced_at < Config.JWT_REVOCATION_SYNC_SECONDS:
+            return
+        _revoked_synced_at = now
+    try:
+        stored = get_active_revocations()
+    except Exception as e:
+        # Keep the local set; retry on the next interval
+        print(f"⚠️ Could not load revoked tokens: {e}")
+        return
+    with _revoked_lock:
+        # Keep local revocations the table does not show yet
+        merged = {d: exp for d, exp in _revoked.items() if exp > now}
+        merged.update(stored)
+        _revoked = merged
+    for digest in stored:
+        _verified.pop(digest)
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _decode_verified(token):
+    """Decode and verify a token, served from the verified cache when possible.
+    Raises the same jwt exceptions as jwt.decode, and InvalidTokenError for revoked tokens.
+    """
+    digest = _digest(token)
+    _sync_revoked()
+    if _revoked and digest in _revoked:
+        raise jwt.InvalidTokenError("Token has been revoked")
+    if Config.JWT_CACHE_SIZE > 0:
+        decoded = _verified.get(digest)
+        if decoded is not None:
+            # Copy so callers can't alter the cached payload
+            return dict(decoded)
+    decoded = jwt.decode(token, Config.get_jwt_secret_key(), algorithms=["HS256"])
+    if Config.JWT_CACHE_SIZE > 0 and "exp" in decoded:
+        _verified.set(digest, decoded, expires_at=float(decoded["exp"]))
+    return dict(decoded)
+
+
+def revoke_token(token):
+    """Reject token from now on, until it expires. The token must be valid.
+    Other processes pick the revocation up within JWT_REVOCATION_SYNC_SECONDS.
+    """
+    decoded = _decode_verified(token)
+    digest = _digest(token)
+    now = time.time()
+    expires_at = float(decoded.get("exp", now + Config.JWT_REFRESH_TOKEN_EXPIRE_DAYS * 86400))
+    add_revoked_token(digest, expires_at)
+    with _revoked_lock:
+        pruned = [d for d, exp in _revoked.items() if exp <= now]
+        for d in pruned:
+            del _revoked[d]
+        _revoked[digest] = expires_at
+    _verified.pop(digest)
+    if pruned:
+        try:
+            delete_expired_revocations()
+        except Exception as e:
+            print(f"⚠️ Could not prune revoked tokens: {e}")
+
+
+def get_token_cache_stats():
+    stats = _verified.stats()
+    with _revoked_lock:
+        stats["revoked"] = len(_revoked)
+    return stats
 
 def generate_access_token(user_id):
     """Generate JWT access token"""
@@ -30,8 +121,12 @@ def generate_refresh_token(user_id):
     except Exception as e:
         raise ValueError(f"Failed to generate refresh token: {str(e)}")
 
-def verify_token(token_type='access'):
-    """Decorator to verify JWT tokens"""
+def verify_token(token_type='access', optional=False):
+    """Decorator to verify JWT tokens
+
+    With optional=True a request without a token is let through with request.user_id = None;
+    a token that is present must still be valid.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -43,15 +138,14 @@ def verify_token(token_type='access'):
                 token = auth_header.split(" ")[1]
 
             if not token:
+                if optional:
+                    request.user_id = None
+                    return func(*args, **kwargs)
                 return jsonify({"error": "Missing token!"}), 401
 
             try:
-                # Decode and verify token
-                decoded = jwt.decode(
-                    token, 
-                    Config.get_jwt_secret_key(), 
-                    algorithms=["HS256"]
-                )
+                # Decode and verify token (cached per token until it expires)
+                decoded = _decode_verified(token)
                 
                 # Verify token type
                 if decoded.get('token_type') != token_type:
@@ -60,6 +154,7 @@ def verify_token(token_type='access'):
                 # Add user info to request context
                 request.user_id = decoded["user_id"]
                 request.token_payload = decoded
+                request.token = token
                 
             except jwt.ExpiredSignatureError:
                 return jsonify({"error": "Token expired!"}), 401
@@ -76,11 +171,7 @@ def refresh_access_token(refresh_token):
     """Generate new access token from refresh token"""
     try:
         # Verify refresh token
-        decoded = jwt.decode(
-            refresh_token, 
-            Config.get_jwt_secret_key(), 
-            algorithms=["HS256"]
-        )
+        decoded = _decode_verified(refresh_token)
         
         if decoded.get('token_type') != 'refresh':
             raise ValueError("Invalid token type")
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+from backend.config.env_config import Config
+
+# bcrypt runs on its own bounded pool: request threads wait on a future instead of
+# competing for every core, and requests beyond BCRYPT_MAX_QUEUE are turned away early
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password operations are already waiting, or one timed out."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"in_flight": 0, "running": 0, "completed": 0, "cancelled": 0, "rejected": 0, "timeouts": 0}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, Config.BCRYPT_WORKERS), thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _tracked(fn, *args):
+    with _stats_lock:
+        _stats["running"] += 1
+    try:
+        return fn(*args)
+    finally:
+        with _stats_lock:
+            _stats["running"] -= 1
+
+
+def _done(future):
+    # Runs for completed and cancelled futures alike, so in_flight never leaks a slot
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+        _stats["cancelled" if future.cancelled() else "completed"] += 1
+
+
+def _submit(fn, *args):
+    with _stats_lock:
+        if _stats["in_flight"] >= max(1, Config.BCRYPT_WORKERS) + Config.BCRYPT_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        _stats["in_flight"] += 1
+    try:
+        future = _get_executor().submit(_tracked, fn, *args)
+    except Exception:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+        raise
+    future.add_done_callback(_done)
+    return future
+
+
+def _wait(future):
+    try:
+        return future.result(timeout=Config.BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        # Drop it if still queued, so a timed-out check does not hold a worker later
+        future.cancel()
+        with _stats_lock:
+            _stats["timeouts"] += 1
+        raise PasswordHasherBusy("Password operation timed out")
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=Config.BCRYPT_ROUNDS)).decode('utf-8')
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_password_async(password):
+    """Future resolving to the bcrypt hash of password at the configured cost."""
+    return _submit(_hash, password)
+
+
+def hash_password(password):
+    return _wait(hash_password_async(password))
+
+
+def check_password(password, password_hash):
+    """True if password matches password_hash. Raises PasswordHasherBusy when overloaded."""
+    return _wait(_submit(_check, password, password_hash))
+
+
+def needs_rehash(password_hash):
+    """True when a hash was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(password_hash.split('$')[2]) != Config.BCRYPT_ROUNDS
+    except (IndexError, ValueError, AttributeError):
+        return False
+
+
+def get_password_hasher_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["queued"] = max(0, stats["in_flight"] - stats["running"])
+    stats["workers"] = max(1, Config.BCRYPT_WORKERS)
+    stats["rounds"] = Config.BCRYPT_ROUNDS
+    return stats
@@ -0,0 +1,51 @@
+import json
+import queue
+import threading
+from flask import Response
+
+# Seconds of silence after which a comment line is sent so proxies keep the stream open
+KEEPALIVE_SECONDS = 15
+
+
+def sse_event(data, event=None) -> str:
+    """Format one Server-Sent Event carrying a JSON payload."""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+def _with_keepalive(events, keepalive):
+    """Drain the event generator on a worker thread, emitting keep-alive comments while it is busy."""
+    q = queue.Queue()
+    done = object()
+
+    def _produce():
+        try:
+            for item in events:
+                q.put(item)
+        except Exception as e:
+            q.put(sse_event({"type": "error", "error": str(e)}, event="error"))
+        finally:
+            q.put(done)
+
+    threading.Thread(target=_produce, daemon=True).start()
+    while True:
+        try:
+            item = q.get(timeout=keepalive)
+        except queue.Empty:
+            yield ": keep-alive\n\n"
+            continue
+        if item is done:
+            return
+        yield item
+
+
+def sse_response(events, keepalive: float = KEEPALIVE_SECONDS) -> Response:
+    """Stream an iterable of already formatted SSE strings as text/event-stream."""
+    return Response(
+        _with_keepalive(events, keepalive),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -61,8 +61,8 @@ const Dashboard = () => {
       const serverDocs = response.documents || [];
       setDocuments(serverDocs);
 
-      // Try to find the just-uploaded document by filename; fallback to most recent
-      const matched = serverDocs.find((d) => d.filename === uploadedFile.name) || serverDocs[0] || null;
+      // The upload's ingestion job reports the id of the document it created
+      const matched = serverDocs.find((d) => d.id === uploadedFile.documentId) || null;
       if (!matched) return;
 
       // Fetch full document details (with content)
@@ -6,6 +6,7 @@ import toast from 'react-hot-toast';
 
 const DocumentUpload = ({ onUploadSuccess }) => {
   const [uploading, setUploading] = useState(false);
+  const [processing, setProcessing] = useState(false);
   const [uploadedFiles, setUploadedFiles] = useState([]);
 
   const onDrop = useCallback(async (acceptedFiles) => {
@@ -35,6 +36,13 @@ const DocumentUpload = ({ onUploadSuccess }) => {
     
     try {
       const response = await documentsAPI.upload(file);
+
+      // The upload returns before the document exists; wait for its ingestion job
+      setProcessing(true);
+      const job = await documentsAPI.waitForJob(response.job_id);
+      if (job.status === 'failed' || !job.document_id) {
+        throw new Error(job.error || 'Document processing failed');
+      }
       
       const uploadedFile = {
         id: Date.now(),
@@ -44,6 +52,7 @@ const DocumentUpload = ({ onUploadSuccess }) => {
         status: 'success',
         message: response.message,
         file: response.file,
+        documentId: job.document_id,
       };
       
       setUploadedFiles(prev => [uploadedFile, ...prev]);
@@ -60,12 +69,17 @@ const DocumentUpload = ({ onUploadSuccess }) => {
         size: file.size,
         type: file.type,
         status: 'error',
-        message: error.response?.data?.error || 'Upload failed',
+        message: error.response?.data?.error || error.message || 'Upload failed',
       };
       
       setUploadedFiles(prev => [failedFile, ...prev]);
+      // Request errors are already reported by the api interceptor
+      if (!error.isAxiosError) {
+        toast.error(failedFile.message);
+      }
       console.error('Upload error:', error);
     } finally {
+      setProcessing(false);
       setUploading(false);
     }
   }, [onUploadSuccess]);
@@ -126,7 +140,7 @@ const DocumentUpload = ({ onUploadSuccess }) => {
             ) : (
               <>
                 <p className="text-lg font-medium text-gray-700">
-                  {uploading ? 'Uploading...' : 'Upload your study document'}
+                  {processing ? 'Processing document...' : uploading ? 'Uploading...' : 'Upload your study document'}
                 </p>
                 <p className="text-sm text-gray-500 mt-1">
                   Drag and drop a PDF, DOCX, or TXT file here, or click to browse
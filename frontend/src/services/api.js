@@ -110,6 +110,23 @@ export const documentsAPI = {
     return response.data;
   },
 
+  // Text extraction and indexing run in the background after upload
+  getJob: async (jobId) => {
+    const response = await api.get(`/documents/jobs/${jobId}`);
+    return response.data.job;
+  },
+
+  // Poll an ingestion job until it is done or failed; resolves with the final job
+  waitForJob: async (jobId, { interval = 1000, timeout = 300000 } = {}) => {
+    const deadline = Date.now() + timeout;
+    while (true) {
+      const job = await documentsAPI.getJob(jobId);
+      if (job.status === 'done' || job.status === 'failed') return job;
+      if (Date.now() > deadline) throw new Error('Document processing timed out');
+      await new Promise((resolve) => setTimeout(resolve, interval));
+    }
+  },
+
   getMyDocuments: async () => {
     const response = await api.get('/documents/my-documents');
     return response.data;